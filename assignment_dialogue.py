@@ -2,9 +2,11 @@ import os
 from dotenv import load_dotenv
 from openai import OpenAI
 from datetime import datetime, time
-import json
 import time
+from itertools import combinations
 from scheduler_logic import slow_print
+from json_stream import IncrementalJSONParser
+from prompts import build_messages, check_prompt_budget
 # Load environment variables
 load_dotenv()
 
@@ -14,6 +16,190 @@ client = OpenAI(
     # organization=os.getenv("OPENAI_ORGANIZATION_ID")
 )  # It will automatically use OPENAI_API_KEY from environment
 
+ASSIGNMENT_FIELDS = ["name", "due date", "due time", "time_allocated", "sessions"]
+
+# JSON schema types of the assignment fields, null when the user did not give the information
+ASSIGNMENT_FIELD_TYPES = {
+    "name": {"type": ["string", "null"]},
+    "due date": {"type": ["string", "null"], "description": "YYYY-MM-DD"},
+    "due time": {"type": ["string", "null"], "description": "HH:MM in 24-hour format"},
+    "time_allocated": {"type": ["integer", "null"], "description": "minutes"},
+    "sessions": {"type": ["integer", "null"]},
+}
+
+# Follow-up questions asked for one assignment before it is left out
+MAX_FOLLOW_UPS = 3
+
+# How each missing field is asked for in a follow-up question
+FOLLOW_UP_PHRASES = {
+    "name": "what the assignment or exam is called",
+    "due date": "the date it's due (or when the exam is)",
+    "due time": "the time it's due (or when the exam starts)",
+    "time_allocated": "how many hours you think you'll need",
+    "sessions": "how many study sessions you'd like to break it into",
+}
+
+def build_follow_up_question(fields):
+    """
+    Phrases a single follow-up question asking for all of the given missing fields.
+    
+    Args:
+        fields (tuple): Missing assignment fields, in the order of ASSIGNMENT_FIELDS
+    
+    Returns:
+        str: The follow-up question
+    """
+    phrases = [FOLLOW_UP_PHRASES[field] for field in fields]
+    # Ask for the date and time together when both are missing
+    if 'due date' in fields and 'due time' in fields:
+        phrases.remove(FOLLOW_UP_PHRASES['due time'])
+        phrases[phrases.index(FOLLOW_UP_PHRASES['due date'])] = "the date and time it's due (or when the exam is)"
+    
+    if len(phrases) == 1:
+        return f"Can you tell me {phrases[0]}?"
+    return f"Can you tell me {', '.join(phrases[:-1])} and {phrases[-1]}?"
+
+# Follow-up question for every combination of missing fields, built once at startup
+FOLLOW_UP_QUESTIONS = {
+    frozenset(fields): build_follow_up_question(fields)
+    for count in range(1, len(ASSIGNMENT_FIELDS) + 1)
+    for fields in combinations(ASSIGNMENT_FIELDS, count)
+}
+
+def assignment_response_format(fields):
+    """
+    Builds a structured output response format asking the model for the given assignment fields.
+    
+    Args:
+        fields (list): Assignment fields (keys of the assignment dictionary) the response should contain
+    
+    Returns:
+        dict: response_format for the chat completions API
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "assignment",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {field: ASSIGNMENT_FIELD_TYPES[field] for field in fields},
+                "required": list(fields),
+                "additionalProperties": False
+            }
+        }
+    }
+
+def assignments_response_format():
+    """
+    Builds a structured output response format asking the model for a list of assignments.
+    
+    Returns:
+        dict: response_format for the chat completions API
+    """
+    assignment_schema = assignment_response_format(ASSIGNMENT_FIELDS)["json_schema"]["schema"]
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "assignments",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {"assignments": {"type": "array", "items": assignment_schema}},
+                "required": ["assignments"],
+                "additionalProperties": False
+            }
+        }
+    }
+
+def validate_assignment_field(field, value):
+    """
+    Checks and converts a single extracted assignment field, as soon as it is received.
+    
+    Args:
+        field (str): Name of the field (key in the assignment dictionary)
+        value: Value extracted by the model
+    
+    Returns:
+        The converted value (date, time or int), or None if the value is missing or invalid
+    """
+    try:
+        if value is None:
+            return None
+        if field == 'due date':
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        if field == 'due time':
+            return datetime.strptime(value, '%H:%M').time()
+        if field in ('time_allocated', 'sessions'):
+            value = int(value)
+            return value if value > 0 else None
+        return str(value).strip() or None
+    except (TypeError, ValueError):
+        return None
+
+def stream_assignment_fields(messages, fields, assignment_data):
+    """
+    Streams a structured output completion and fills assignment_data field by field as the JSON arrives.
+    Stops reading as soon as every requested field has been received. Fields that are missing, invalid
+    or cut off by malformed output are left as None so they can be asked for as a follow-up.
+    
+    Args:
+        messages (list): Messages to send to the model
+        fields (list): Assignment fields the model is asked to extract
+        assignment_data (dict): Dictionary to store extracted assignment information
+    """
+    stream = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=messages,
+        response_format=assignment_response_format(fields),
+        stream=True
+    )
+    
+    parser = IncrementalJSONParser()
+    received = set()
+    for chunk in stream:
+        if not chunk.choices or chunk.choices[0].delta.content is None:
+            continue
+        for (field,), value in parser.feed(chunk.choices[0].delta.content):
+            if field in fields:
+                assignment_data[field] = validate_assignment_field(field, value)
+                received.add(field)
+        if received.issuperset(fields):
+            # Everything needed is here, don't wait for the rest of the stream
+            stream.close()
+            break
+
+def stream_assignments(messages):
+    """
+    Streams a structured output completion holding a list of assignments and yields each assignment,
+    validated, as soon as it is complete, so follow-ups for it can start while the rest is still streaming.
+    
+    Args:
+        messages (list): Messages to send to the model
+    
+    Yields:
+        dict: Assignment dictionary, with None for fields that are missing or invalid
+    """
+    stream = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=messages,
+        response_format=assignments_response_format(),
+        stream=True
+    )
+    
+    parser = IncrementalJSONParser(emit_depth=2)
+    try:
+        for chunk in stream:
+            if not chunk.choices or chunk.choices[0].delta.content is None:
+                continue
+            for path, item in parser.feed(chunk.choices[0].delta.content):
+                if len(path) == 2 and path[0] == "assignments" and isinstance(item, dict):
+                    yield {field: validate_assignment_field(field, item.get(field)) for field in ASSIGNMENT_FIELDS}
+            if parser.done:
+                break
+    finally:
+        stream.close()
+
 def get_initial_assignment_info(is_first_assignment=True):
     """
     Prompts the user for initial assignment information and returns their response.
@@ -26,16 +212,16 @@ def get_initial_assignment_info(is_first_assignment=True):
     """
     if is_first_assignment:
         prompt = """
-    Tell me about an upcoming exam or assignment you have! 
-    Please include:
+    Tell me about your upcoming exams or assignments! You can list as many as you like at once.
+    For each one, please include:
     - When it's due (date and time)
     - How much time you think you'll need (in hours)
     - How many study sessions you'd like to break it into
-    For example: "My AI Programming Assignment #3 is due next Saturday at 6pm. I think it'll take 8 hours. Break that down into 4 sessions."
+    For example: "My AI Programming Assignment #3 is due next Saturday at 6pm. I think it'll take 8 hours. Break that down into 4 sessions. My Calc exam is Tuesday at 2pm, 3 hours in 3 sessions."
     """
     else:
         prompt = """
-    Tell me about another upcoming exam or assignment! Remember to include:
+    Tell me about other upcoming exams or assignments! Remember to include for each one:
     - When it's due (date and time)
     - How much time you think you'll need (in hours)
     - How many study sessions you'd like to break it into
@@ -47,63 +233,28 @@ def get_initial_assignment_info(is_first_assignment=True):
     user_response = input()
     return user_response
 
-def process_assignment_dialogue(user_input, assignment_data):
+def process_assignments_dialogue(user_input, today=None):
     """
-    Processes user input to extract assignment information using GPT model.
+    Processes user input describing one or more assignments, extracting all of them with a single GPT call.
     
     Args:
         user_input (str): Raw user input containing assignment details
-        assignment_data (dict): Dictionary to store extracted assignment information
-        
-    Returns:
-        list: List of missing fields that still need to be collected in the assignment (key values in the dictionary)
-    """
-    current_date = datetime.now()
-    # Create the messages array
-    messages = [
-        {"role": "system", "content": f"""
-                Extract assignment information and respond in JSON format.
-                Today is {current_date.strftime('%Y-%m-%d')}.
-                
-                Return JSON with these fields:
-                - name: descriptive name for the assignment
-                - due date: YYYY-MM-DD
-                - due time: HH:MM in 24-hour format
-                - time_allocated: minutes (convert from hours)
-                - sessions: number
-                Make sure to return JUST the JSON, nothing else.
-                Example Response:
-                {{
-                    "name": "Calculus Exam",
-                    "due date": "2024-03-19",
-                    "due time": "14:00",
-                    "time_allocated": 180,
-                    "sessions": 4
-                }}
-            """},
-            {"role": "user", "content": user_input}
-        ]
+        today (date): Date relative dates are resolved against, defaults to the current date
         
-    response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-        
-    # Parse JSON response
-    extracted_info = json.loads(response.choices[0].message.content)
-
-    # Convert date and time strings to datetime objects
-    if extracted_info.get('due date'):
-        extracted_info['due date'] = datetime.strptime(extracted_info['due date'], '%Y-%m-%d').date()
-    if extracted_info.get('due time'):
-        extracted_info['due time'] = datetime.strptime(extracted_info['due time'], '%H:%M').time()
-    
-    # Update assignment_data
-    assignment_data.update(extracted_info)
+    Yields:
+        dict: Assignment dictionary as soon as it has streamed in, with None for fields that still need to be collected
+    """
+    # Static prompt first, then today's date and the user's input
+    messages = build_messages("assignments_extraction", user_input, today or datetime.now().date())
+    check_prompt_budget("assignments_extraction", messages)
     
-    # Return missing fields
-    missing_fields = [k for k, v in assignment_data.items() if v is None]
-    return missing_fields
+    found = False
+    for assignment_data in stream_assignments(messages):
+        found = True
+        yield assignment_data
+    if not found:
+        # Nothing recognisable, so ask for every field of a single assignment
+        yield dict.fromkeys(ASSIGNMENT_FIELDS)
 
 def handle_missing_info(missing_fields, assignment_data):
     """
@@ -113,22 +264,11 @@ def handle_missing_info(missing_fields, assignment_data):
         missing_fields (list): List of fields that need to be collected
         assignment_data (dict): Dictionary to update with collected information
     """
-    current_date = datetime.now()
-    # Generate comprehensive follow-up question using GPT
-    response = client.chat.completions.create(
-        model='gpt-4o-mini',
-        messages=[
-            {"role": "system", "content": """
-                Generate a natural follow-up question asking for all of the missing information.
-                For example, if the missing fields are "due date" and "due time", the question should be something
-                like "Can you tell me the date and time it's due (or when the exam is)?"
-            """},
-            {"role": "user", "content": f"Generate a question asking for these missing inputs: {', '.join(missing_fields)}"}
-        ]
-    )
-    
-    # Get the follow-up question
-    question = response.choices[0].message.content
+    # Look up the precomputed follow-up question, so the only model call is the extraction below
+    question = FOLLOW_UP_QUESTIONS[frozenset(missing_fields)]
+    if assignment_data.get('name'):
+        # Several assignments may be missing information, so say which one this is about
+        question = f"For {assignment_data['name']}: {question}"
     print("\nAI College Coach: ", end='')
     slow_print(question)
     
@@ -136,41 +276,10 @@ def handle_missing_info(missing_fields, assignment_data):
     slow_print("You: ")
     user_response = input()
     
-    # Process the response for all fields
-    field_response = client.chat.completions.create(
-        model='gpt-4o-mini',
-        messages=[
-            {"role": "system", "content": f"""
-                Extract the following fields from the response and format in JSON:
-                {', '.join(missing_fields)}
-
-                Today is {current_date.strftime('%Y-%m-%d')}.
-                When processing relative dates (like 'next Saturday' or 'tomorrow'):
-                - Use current date as reference
-                
-                Use the same format as the main dialogue:
-                - due date: YYYY-MM-DD
-                - due time: HH:MM in 24-hour format
-                - time_allocated: minutes (convert from hours if needed)
-                - sessions: number
-                
-                Return only these fields in JSON format.
-            """},
-            {"role": "user", "content": user_response}
-        ]
-    )
-    
-    # Update the specific fields
-    extracted_info = json.loads(field_response.choices[0].message.content)
-    
-    # Convert date/time if needed
-    if 'due date' in extracted_info:
-        extracted_info['due date'] = datetime.strptime(extracted_info['due date'], '%Y-%m-%d').date()
-    if 'due time' in extracted_info:
-        extracted_info['due time'] = datetime.strptime(extracted_info['due time'], '%H:%M').time()
-    
-    # Update assignment_data with new values
-    assignment_data.update(extracted_info)
+    # Process the response for all fields, the requested fields are given by the response schema
+    messages = build_messages("field_extraction", user_response, datetime.now().date())
+    check_prompt_budget("field_extraction", messages)
+    stream_assignment_fields(messages, missing_fields, assignment_data)
 
 def handle_emotional_checkin():
     """
@@ -184,23 +293,24 @@ def handle_emotional_checkin():
     user_response = input()
     
     # Get emotion from fine-tuned model
+    messages = build_messages("emotion_detection", user_response)
+    check_prompt_budget("emotion_detection", messages)
     emotion_response = client.chat.completions.create(
         model=os.getenv("OPENAI_FINETUNED_MODEL"),
-        messages=[
-            {"role": "system", "content": "Detect the emotions in the input in a couple words."},
-            {"role": "user", "content": user_response}
-        ]
+        messages=messages
     )
     detected_emotion = emotion_response.choices[0].message.content.strip()
     
     # Get supportive response from main model with streaming
     print("\nAI College Coach: ", end='', flush=True)  # Print prefix without newline
+    messages = build_messages(
+        "supportive_response",
+        f"The user is feeling {detected_emotion} about their assignments. Respond with empathy and encouragement."
+    )
+    check_prompt_budget("supportive_response", messages)
     stream = client.chat.completions.create(
         model='gpt-4o-mini',
-        messages=[
-            {"role": "system", "content": "You are an empathetic AI coach. Acknowledge the user's emotion and provide a supportive, encouraging response."},
-            {"role": "user", "content": f"The user is feeling {detected_emotion} about their assignments. Respond with empathy and encouragement."}
-        ],
+        messages=messages,
         stream=True  # Enable streaming
     )
     
@@ -213,35 +323,40 @@ def handle_emotional_checkin():
 def collect_assignment_info(is_first_assignment=True):
     """
     Main function to collect assignment information from the user.
-    Handles input of multiple assignments and returns collected data.
+    Handles input of multiple assignments (several per message) and returns collected data.
     
     Returns:
         list: List of dictionaries containing assignment information
     """
     assignments = []
-    assignment_data = {
-        "name": None,
-        "due date": None,
-        "due time": None,
-        "time_allocated": None,
-        "sessions": None
-    }
     
-    # Get and process initial response
-    user_input = get_initial_assignment_info(is_first_assignment)  # Pass the flag
-    missing_fields = process_assignment_dialogue(user_input, assignment_data)
-    
-    # Handle follow-ups if needed
-    if missing_fields:
-        handle_missing_info(missing_fields, assignment_data)
-    
-    # Add to assignments list
-    assignments.append(assignment_data)
-    
-    # Ask about another assignment
-    slow_print("\nWould you like to add another exam or assignment? (yes/no): ")
-    another = input().lower()
-    if another in ['y', 'yes']:
-        assignments.extend(collect_assignment_info(False)) # Recursive call with is_first_assignment=False
+    while True:
+        # Get and process the response, which may describe several assignments
+        user_input = get_initial_assignment_info(is_first_assignment)
+        # Each assignment is followed up on as soon as it arrives, while the others are still streaming
+        for assignment_data in process_assignments_dialogue(user_input):
+            # Handle follow-ups until every field is filled in, invalid answers are cleared again by validation
+            missing_fields = [k for k, v in assignment_data.items() if v is None]
+            for _ in range(MAX_FOLLOW_UPS):
+                if not missing_fields:
+                    break
+                handle_missing_info(missing_fields, assignment_data)
+                missing_fields = [k for k, v in assignment_data.items() if v is None]
+            
+            # Only complete assignments can be scheduled
+            if missing_fields:
+                name = assignment_data.get('name') or "this assignment"
+                slow_print(f"\nI still don't have the {', '.join(missing_fields)} for {name}, so I'll leave it out for now. You can add it again afterwards.")
+                continue
+            
+            # Add to assignments list
+            assignments.append(assignment_data)
+        
+        # Ask about another assignment
+        slow_print("\nWould you like to add another exam or assignment? (yes/no): ")
+        another = input().lower()
+        if another not in ['y', 'yes']:
+            break
+        is_first_assignment = False
     
     return assignments
@@ -0,0 +1,148 @@
+import datetime
+import re
+from time_slots import MINUTES_PER_DAY, MINUTES_PER_WEEK
+
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+DAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+TIME_RANGE_PATTERN = r'(\d{1,2}:\d{2}\s*[AaPp][Mm])\s*-\s*(\d{1,2}:\d{2}\s*[AaPp][Mm])'
+TEMPLATE_LINE_PATTERN = r'^\s*([A-Za-z][A-Za-z ,]*):(.*)$'
+
+
+def parse_day_names(text):
+    """
+    Converts day names like "Monday, wed, FR" into weekday indexes (Monday=0)
+
+    Args:
+        text (string): comma separated day names, full or abbreviated
+    """
+    days = []
+    for name in text.split(','):
+        code = name.strip()[:2].upper()
+        if code not in DAY_CODES:
+            raise ValueError(f"Unknown day '{name.strip()}'")
+        days.append(DAY_CODES.index(code))
+    return days
+
+
+def parse_time_ranges(text):
+    """
+    Finds all time ranges in a string like "8:15AM-12:30PM, 11:00PM-7:00AM"
+
+    Args:
+        text (string): time ranges in the unavailable time format
+
+    Returns:
+        [(int, int)]: (start, end) minutes after midnight, end <= start for ranges spanning midnight
+    """
+    ranges = []
+    for start, end in re.findall(TIME_RANGE_PATTERN, text):
+        start_time = datetime.datetime.strptime(start.replace(' ', '').upper(), "%I:%M%p").time()
+        end_time = datetime.datetime.strptime(end.replace(' ', '').upper(), "%I:%M%p").time()
+        ranges.append((start_time.hour * 60 + start_time.minute, end_time.hour * 60 + end_time.minute))
+    return ranges
+
+
+def to_week_intervals(day, ranges):
+    """
+    Places the time ranges of one day on the week, letting ranges that span midnight run into the next day
+
+    Args:
+        day (int): weekday index (Monday=0)
+        ranges ([(int, int)]): (start, end) minutes after midnight
+
+    Returns:
+        [(int, int)]: (start, end) minutes after Monday midnight
+    """
+    intervals = []
+    for start, end in ranges:
+        if end <= start:
+            end += MINUTES_PER_DAY
+        intervals.append((day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + end))
+    return intervals
+
+
+def parse_week_template(lines):
+    """
+    Parses a weekly availability template with one line per day (or group of days), e.g.
+        Monday, Wednesday, Friday: 8:15AM-12:30PM, 11:00PM-7:00AM
+        Sunday: 10:00AM-2:00PM
+    Blank lines and lines starting with # are ignored.
+
+    Args:
+        lines ([string]): lines of the template
+
+    Returns:
+        [(int, int)]: unavailable (start, end) minutes after Monday midnight
+    """
+    intervals = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        match = re.match(TEMPLATE_LINE_PATTERN, line)
+        ranges = parse_time_ranges(match.group(2)) if match else []
+        if not ranges:
+            raise ValueError(f"Line {number} is not in the format 'Monday: 8:15AM-12:30PM, 1:00PM-3:00PM'")
+        for day in parse_day_names(match.group(1)):
+            intervals.extend(to_week_intervals(day, ranges))
+    return intervals
+
+
+def load_week_template(path):
+    """
+    Reads a weekly availability template from a file
+
+    Args:
+        path (string): path of the template file
+    """
+    with open(path, 'r') as f:
+        return parse_week_template(f.readlines())
+
+
+def merge_week_intervals(intervals):
+    """
+    Coalesces overlapping or touching intervals on the week, including ones wrapping from Sunday into Monday
+
+    Args:
+        intervals ([(int, int)]): (start, end) minutes after Monday midnight, end may run past the end of the week
+
+    Returns:
+        [(int, int)]: sorted, disjoint intervals with starts inside the week
+    """
+    merged = []
+    for start, end in sorted((start % MINUTES_PER_WEEK, start % MINUTES_PER_WEEK + end - start)
+                             for start, end in intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    # An interval running past Sunday midnight can swallow the first intervals of Monday
+    while len(merged) > 1 and merged[-1][1] - MINUTES_PER_WEEK >= merged[0][0]:
+        first_start, first_end = merged.pop(0)
+        last_start, last_end = merged[-1]
+        merged[-1] = (last_start, max(last_end, first_end + MINUTES_PER_WEEK))
+
+    # A slot covering the whole week is capped to a single week
+    if merged and merged[-1][1] - merged[-1][0] >= MINUTES_PER_WEEK:
+        merged = [(merged[-1][0], merged[-1][0] + MINUTES_PER_WEEK)]
+    return merged
+
+
+def group_recurring_slots(intervals):
+    """
+    Groups merged week intervals which start at the same time of day and last equally long,
+    so each group can be written as one weekly recurring event
+
+    Args:
+        intervals ([(int, int)]): merged intervals from merge_week_intervals
+
+    Returns:
+        [([int], int, int)]: (weekday indexes, start minutes after midnight, duration in minutes)
+    """
+    groups = {}
+    for start, end in intervals:
+        key = (start % MINUTES_PER_DAY, end - start)
+        groups.setdefault(key, []).append(start // MINUTES_PER_DAY)
+    return [(sorted(days), start, duration) for (start, duration), days in sorted(groups.items())]
@@ -0,0 +1,108 @@
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from assignment_dialogue import stream_assignments, validate_assignment_field
+from prompts import CURRENT_VERSIONS, build_messages, count_message_tokens
+
+# Fields compared against the expected extraction (names are free text, so they are only checked for presence)
+SCORED_FIELDS = ["due date", "due time", "time_allocated", "sessions"]
+
+
+def load_corpus(path):
+    """
+    Loads the benchmark cases: user inputs with the date they were written on and the expected assignments.
+    
+    Args:
+        path (str): Path of the JSONL corpus
+    """
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def score_case(case, assignments):
+    """
+    Compares extracted assignments with the expected ones, in order.
+    
+    Args:
+        case (dict): Benchmark case from the corpus
+        assignments (list): Assignments returned by stream_assignments
+    
+    Returns:
+        tuple: (correct fields, scored fields, whether the number of assignments matched, names present)
+    """
+    correct = 0
+    total = 0
+    names = 0
+    for index, expected in enumerate(case["expected"]):
+        extracted = assignments[index] if index < len(assignments) else {}
+        names += bool(extracted.get("name"))
+        for field in SCORED_FIELDS:
+            total += 1
+            correct += extracted.get(field) == validate_assignment_field(field, expected[field])
+    return correct, total, len(assignments) == len(case["expected"]), names
+
+
+def run_benchmark(corpus, version):
+    """
+    Runs every corpus case through the multi-assignment extraction with one prompt version.
+    
+    Args:
+        corpus (list): Benchmark cases
+        version (int): Version of the assignments_extraction prompt
+    
+    Returns:
+        dict: Prompt tokens, latency and accuracy measured for the version
+    """
+    tokens, latencies = [], []
+    correct = total = count_matches = names = expected_items = 0
+    for case in corpus:
+        today = datetime.strptime(case["today"], "%Y-%m-%d").date()
+        messages = build_messages("assignments_extraction", case["input"], today, version)
+        tokens.append(count_message_tokens(messages))
+        
+        start = time.perf_counter()
+        assignments = list(stream_assignments(messages))
+        latencies.append(time.perf_counter() - start)
+        
+        case_correct, case_total, count_match, case_names = score_case(case, assignments)
+        correct += case_correct
+        total += case_total
+        count_matches += count_match
+        names += case_names
+        expected_items += len(case["expected"])
+    
+    return {
+        "version": version,
+        "cases": len(corpus),
+        "mean_prompt_tokens": statistics.mean(tokens),
+        "max_prompt_tokens": max(tokens),
+        "median_latency_s": statistics.median(latencies),
+        "mean_latency_s": statistics.mean(latencies),
+        "field_accuracy": correct / total,
+        "assignment_count_accuracy": count_matches / len(corpus),
+        "name_coverage": names / expected_items,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure prompt tokens, latency and extraction accuracy of the assignment prompts.")
+    parser.add_argument("--corpus", default="prompt_benchmark_corpus.jsonl")
+    parser.add_argument("--versions", type=int, nargs="+", default=[CURRENT_VERSIONS["assignments_extraction"]])
+    parser.add_argument("--output", help="Optional JSON file to write the results to")
+    args = parser.parse_args()
+    
+    corpus = load_corpus(args.corpus)
+    results = [run_benchmark(corpus, version) for version in args.versions]
+    for result in results:
+        print(f"Prompt version {result['version']} ({result['cases']} cases)")
+        print(f"  Prompt tokens: mean {result['mean_prompt_tokens']:.1f}, max {result['max_prompt_tokens']}")
+        print(f"  Latency: median {result['median_latency_s']:.2f}s, mean {result['mean_latency_s']:.2f}s")
+        print(f"  Field accuracy: {result['field_accuracy']:.2%}")
+        print(f"  Assignment count accuracy: {result['assignment_count_accuracy']:.2%}")
+        print(f"  Names extracted: {result['name_coverage']:.2%}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,250 @@
+import json
+import random
+import threading
+import time
+from google.auth.exceptions import TransportError
+from googleapiclient.errors import HttpError
+from httplib2 import HttpLib2Error
+
+
+# Retry settings for failed Google Calendar requests
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 32.0
+
+# Local request budget per calendar, kept below Google's per-user quota
+REQUESTS_PER_SECOND = 5.0
+BURST_SIZE = 10
+
+# Requests sent per batch HTTP call, Google recommends no more than 50
+BATCH_SIZE = 50
+
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded'}
+
+# Errors meaning the calendar could not be read, e.g. no network (httplib2's ServerNotFoundError)
+# or a failed token refresh (google.auth's TransportError)
+CALENDAR_UNREACHABLE = (HttpError, OSError, HttpLib2Error, TransportError)
+
+request_metrics = {
+    'calls': 0,          # requests sent to the API, including retries
+    'retried': 0,        # attempts repeated after a retryable failure
+    'rate_limited': 0,   # 403/429 rate limit responses received from the API
+    'throttled': 0,      # requests delayed by the local token bucket
+    'failed': 0,         # retryable requests given up on after MAX_RETRIES
+    'wait_seconds': 0.0, # total time spent waiting on throttling and backoff
+}
+_metrics_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Token bucket limiting how quickly requests to a single calendar are sent
+
+    Args:
+        rate (float): tokens added per second
+        capacity (int): maximum number of tokens, allowing short bursts
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token, blocking until one is available. Returns the number of seconds waited.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(calendar_id):
+    """
+    Returns the token bucket shared by all writers of the given calendar
+
+    Args:
+        calendar_id (string): id of the calendar, or None for account level requests
+    """
+    with _buckets_lock:
+        if calendar_id not in _buckets:
+            _buckets[calendar_id] = TokenBucket(REQUESTS_PER_SECOND, BURST_SIZE)
+        return _buckets[calendar_id]
+
+
+def _record(key, amount=1):
+    with _metrics_lock:
+        request_metrics[key] += amount
+
+
+def get_request_metrics():
+    """
+    Returns a snapshot of the counters for calls, retries and throttling
+    """
+    with _metrics_lock:
+        return dict(request_metrics)
+
+
+def reset_request_metrics():
+    """
+    Sets all request counters back to zero
+    """
+    with _metrics_lock:
+        for key in request_metrics:
+            request_metrics[key] = 0.0 if key == 'wait_seconds' else 0
+
+
+def error_reasons(error):
+    """
+    Extracts the reason codes (e.g. rateLimitExceeded) from an HttpError body
+
+    Args:
+        error (HttpError): error raised by the Google API client
+    """
+    try:
+        content = error.content.decode('utf-8') if isinstance(error.content, bytes) else error.content
+        details = json.loads(content).get('error', {})
+    except (ValueError, AttributeError):
+        return set()
+    return {item.get('reason') for item in details.get('errors', [])}
+
+
+def is_rate_limited(error):
+    """
+    Checks whether an HttpError means the request exceeded a rate limit or quota
+
+    Args:
+        error (HttpError): error raised by the Google API client
+    """
+    status = error.resp.status
+    return status == 429 or (status == 403 and bool(error_reasons(error) & RATE_LIMIT_REASONS))
+
+
+def is_retryable(error):
+    """
+    Checks whether a failed request is worth sending again
+
+    Args:
+        error (Exception): error raised while executing the request
+    """
+    if isinstance(error, HttpError):
+        return error.resp.status >= 500 or is_rate_limited(error)
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def retry_delay(error, attempt):
+    """
+    Seconds to wait before the next attempt, honoring the Retry-After header when present
+
+    Args:
+        error (Exception): error raised by the failed attempt
+        attempt (int): number of attempts already made
+    """
+    if isinstance(error, HttpError):
+        retry_after = error.resp.get('retry-after') if hasattr(error.resp, 'get') else None
+        if retry_after is not None:
+            try:
+                # Capped so a single header cannot hold up the coach for long
+                return min(max(float(retry_after), 0.0), MAX_DELAY)
+            except ValueError:
+                pass
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+def execute_request(request, calendar_id=None, cost=1, idempotent=True):
+    """
+    Executes a Google Calendar API request, throttled per calendar and retried with backoff on transient errors
+
+    Args:
+        request (HttpRequest): request built by the calendar service, e.g. service.events().insert(...)
+        calendar_id (string): id of the calendar the request targets, or None for account level requests
+        cost (int): number of API requests this call counts as against the quota (e.g. the size of a batch)
+        idempotent (bool): whether sending the request twice is harmless. Inserts without a preset id are not,
+            since a server error may come after the insert succeeded, so they are only retried when rate limited
+    """
+    bucket = get_bucket(calendar_id)
+    attempt = 0
+    while True:
+        waited = sum(bucket.acquire() for _ in range(cost))
+        if waited:
+            _record('throttled')
+            _record('wait_seconds', waited)
+        _record('calls', cost)
+        try:
+            return request.execute()
+        except Exception as error:
+            rate_limited = isinstance(error, HttpError) and is_rate_limited(error)
+            if rate_limited:
+                _record('rate_limited')
+            if not is_retryable(error) or not (idempotent or rate_limited):
+                raise
+            if attempt >= MAX_RETRIES:
+                _record('failed')
+                raise
+            delay = retry_delay(error, attempt)
+            attempt += 1
+            _record('retried')
+            _record('wait_seconds', delay)
+            time.sleep(delay)
+
+
+def execute_batch(service, requests, calendar_id=None):
+    """
+    Sends several Google Calendar API requests in as few HTTP round trips as possible using batch requests.
+    Requests in the batch that fail with a retryable error are sent again in a new batch after backing off.
+
+    Args:
+        service (string): Resource object for interacting with Google's calendar API
+        requests ([HttpRequest]): requests built by the calendar service
+        calendar_id (string): id of the calendar the requests target
+
+    Returns:
+        [(dict, Exception)]: response and error of each request, in the order of requests
+    """
+    results = [(None, None)] * len(requests)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    pending = list(range(len(requests)))
+    attempt = 0
+    while pending:
+        for chunk_start in range(0, len(pending), BATCH_SIZE):
+            chunk = pending[chunk_start:chunk_start + BATCH_SIZE]
+            batch = service.new_batch_http_request(callback=callback)
+            for index in chunk:
+                batch.add(requests[index], request_id=str(index))
+            execute_request(batch, calendar_id, cost=len(chunk))
+
+        failed = [index for index in pending if results[index][1] is not None and is_retryable(results[index][1])]
+        for index in failed:
+            error = results[index][1]
+            if isinstance(error, HttpError) and is_rate_limited(error):
+                _record('rate_limited')
+        if not failed:
+            break
+        if attempt >= MAX_RETRIES:
+            _record('failed', len(failed))
+            break
+        delay = max(retry_delay(results[index][1], attempt) for index in failed)
+        attempt += 1
+        _record('retried', len(failed))
+        _record('wait_seconds', delay)
+        time.sleep(delay)
+        pending = failed
+    return results
@@ -1,17 +1,30 @@
 import openai
 import os
+from fine_tune_jobs import load_job_state, fetch_new_events, save_job_state, save_fine_tuned_model, ENV_FILE
 
 # Set your API key
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-# Fine-tune job ID
-fine_tune_job_id = "ftjob-yCy8KgUcxnASCbKKQOPuPrGV"  
+# Fine-tune job saved by fine_tune.py
+state = load_job_state()
+if state is None:
+    raise SystemExit("No fine-tuning job found, run fine_tune.py first.")
 
-# Retrieve and print job events
-events = openai.fine_tuning.jobs.list_events(fine_tune_job_id)
-for event in events.data:
+# Print the job events that arrived since the last check
+events = fetch_new_events(openai, state["job_id"], state["last_event_id"])
+for event in events:
     print(event.message)
+if events:
+    state["last_event_id"] = events[-1].id
 
 # Fetch and print job status
-job_status = openai.fine_tuning.jobs.retrieve(fine_tune_job_id)
-print(f"Job Status: {job_status.status}")
\ No newline at end of file
+job_status = openai.fine_tuning.jobs.retrieve(state["job_id"])
+state["status"] = job_status.status
+state["fine_tuned_model"] = job_status.fine_tuned_model
+save_job_state(state)
+print(f"Job Status: {job_status.status}")
+
+# Save the resulting model where the coach reads it
+if job_status.status == "succeeded" and job_status.fine_tuned_model:
+    save_fine_tuned_model(job_status.fine_tuned_model)
+    print(f"Saved fine-tuned model {job_status.fine_tuned_model} to {ENV_FILE}")
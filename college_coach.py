@@ -8,7 +8,7 @@ def collegeCoachAI():
 
     # Get the assignment info from a student that they want to schedule slots for and make a schedule from it
     assignments = collect_assignment_info()
-    dedicateAssignmentTimes(service, calendar_id, assignments)
+    dedicateAssignmentTimes(service, calendar_id, assignments, incremental=True)
     
     handle_emotional_checkin()
 
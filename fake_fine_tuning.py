@@ -0,0 +1,76 @@
+import itertools
+from types import SimpleNamespace
+
+
+class FakeFineTuningClient:
+    """
+    Local stand-in for the OpenAI files and fine-tuning endpoints used by fine_tune_jobs, so a job can be
+    tracked without the API. Every retrieve advances the job one step through its scripted progress.
+
+    Args:
+        steps (int): number of training step events reported before the job succeeds
+        fail (bool): whether the job ends as failed instead of succeeded
+    """
+    def __init__(self, steps=3, fail=False):
+        self.steps = steps
+        self.fail = fail
+        self.ids = itertools.count(1)
+        self.uploaded = {}
+        self.jobs = {}
+        self.files = SimpleNamespace(create=self.create_file)
+        self.fine_tuning = SimpleNamespace(jobs=SimpleNamespace(
+            create=self.create_job,
+            retrieve=self.retrieve_job,
+            list_events=self.list_events,
+        ))
+
+    def create_file(self, file, purpose):
+        file_id = f"file-fake{next(self.ids)}"
+        self.uploaded[file_id] = file.read()
+        return SimpleNamespace(id=file_id, purpose=purpose)
+
+    def create_job(self, model, training_file, validation_file=None, suffix=None):
+        job_id = f"ftjob-fake{next(self.ids)}"
+        self.jobs[job_id] = {
+            "model": model,
+            "suffix": suffix,
+            "status": "validating_files",
+            "step": 0,
+            "events": [],
+            "fine_tuned_model": None,
+        }
+        self.add_event(job_id, f"Created fine-tuning job: {job_id}")
+        return self.job_resource(job_id)
+
+    def add_event(self, job_id, message):
+        self.jobs[job_id]["events"].append(SimpleNamespace(id=f"ftevent-fake{next(self.ids)}", message=message))
+
+    def job_resource(self, job_id):
+        job = self.jobs[job_id]
+        return SimpleNamespace(id=job_id, status=job["status"], fine_tuned_model=job["fine_tuned_model"])
+
+    def retrieve_job(self, job_id):
+        job = self.jobs[job_id]
+        if job["status"] not in ("succeeded", "failed", "cancelled"):
+            job["step"] += 1
+            if job["step"] == 1:
+                job["status"] = "running"
+                self.add_event(job_id, "Fine-tuning job started")
+            elif job["step"] <= self.steps + 1:
+                self.add_event(job_id, f"Step {job['step'] - 1}/{self.steps}: training loss={1.0 / job['step']:.2f}")
+            elif self.fail:
+                job["status"] = "failed"
+                self.add_event(job_id, "Fine-tuning job failed")
+            else:
+                job["status"] = "succeeded"
+                job["fine_tuned_model"] = f"ft:{job['model']}:personal:{(job['suffix'] or '').lower()}:{job_id.split('-')[-1]}"
+                self.add_event(job_id, "The job has successfully completed")
+        return self.job_resource(job_id)
+
+    def list_events(self, job_id, after=None, limit=20):
+        # Newest first, paging backwards past the event given in after, like the API
+        events = self.jobs[job_id]["events"][::-1]
+        if after is not None:
+            ids = [event.id for event in events]
+            events = events[ids.index(after) + 1:]
+        return SimpleNamespace(data=events[:limit], has_more=len(events) > limit)
@@ -1,19 +1,19 @@
+import argparse
 import openai
 import os
+from fine_tune_jobs import TRAINING_FILE, VALIDATION_FILE, start_job, track_job
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-# Fine-tune model
-fine_tune_response = openai.fine_tuning.jobs.create(
-    model="gpt-4o-mini-2024-07-18",
-    training_file="file-YTuM53fhq6UQIbOqhrCCAuk3",
-    validation_file="file-7cCYwFyQCd0zTmUTBMqmM7Z5",
-    suffix="AICollegeCoach_Model",
-)
+parser = argparse.ArgumentParser(description="Fine-tune the emotion detection model.")
+parser.add_argument("--training-file", default=TRAINING_FILE, help="Chat formatted training file from preprocess_dataset.py")
+parser.add_argument("--validation-file", default=VALIDATION_FILE, help="Chat formatted validation file from preprocess_dataset.py")
+parser.add_argument("--force", action="store_true", help="Start a new job even if the saved job already succeeded")
+args = parser.parse_args()
 
-# Access the ID attribute
-print(f"Fine-tuning job started with ID: {fine_tune_response.id}")
+# Fine-tune model, resuming the saved job if one is still running
+state = start_job(openai, args.training_file, args.validation_file, force=args.force)
 
-# Fetch and print job status
-job_status = openai.fine_tuning.jobs.retrieve("ftjob-yCy8KgUcxnASCbKKQOPuPrGV")
-print(f"Job Status: {job_status.status}")
\ No newline at end of file
+# Follow the job until it finishes and save the resulting model id to .env
+state = track_job(openai, state)
+print(f"Job Status: {state['status']}")
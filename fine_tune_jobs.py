@@ -0,0 +1,212 @@
+import json
+import os
+import time
+import openai
+from dotenv import set_key
+
+
+BASE_MODEL = "gpt-4o-mini-2024-07-18"
+MODEL_SUFFIX = "AICollegeCoach_Model"
+
+# Chat formatted files written by preprocess_dataset.py
+TRAINING_FILE = "empatheticdialogues_chat_formatted_train.jsonl"
+VALIDATION_FILE = "empatheticdialogues_chat_formatted_valid.jsonl"
+
+# Local record of the current job, so tracking can resume after the script stops
+JOB_STATE_FILE = "fine_tune_job.json"
+# File the coach loads OPENAI_FINETUNED_MODEL from
+ENV_FILE = ".env"
+
+# Poll quickly while the job reports progress and back off while it is quiet
+MIN_POLL_INTERVAL = 5.0
+MAX_POLL_INTERVAL = 120.0
+EVENTS_PAGE_SIZE = 50
+
+TERMINAL_STATUSES = {"succeeded", "failed", "cancelled"}
+
+
+def load_job_state(path=JOB_STATE_FILE):
+    """
+    Reads the locally saved job state, returning None if no job has been started
+
+    Args:
+        path (string): path of the job state file
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_job_state(state, path=JOB_STATE_FILE):
+    """
+    Writes the job state to the local job state file
+
+    Args:
+        state (dict): job state from start_job
+        path (string): path of the job state file
+    """
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=2)
+
+
+def upload_file(client, path):
+    """
+    Uploads a prepared JSONL file for fine-tuning
+
+    Args:
+        client: OpenAI client (or the openai module) exposing the files endpoints
+        path (string): path of the JSONL file
+
+    Returns:
+        string: id of the uploaded file
+    """
+    with open(path, 'rb') as f:
+        return client.files.create(file=f, purpose="fine-tune").id
+
+
+def start_job(client=openai, training_path=TRAINING_FILE, validation_path=VALIDATION_FILE, state_path=JOB_STATE_FILE, force=False):
+    """
+    Uploads the training and validation files and creates a fine-tuning job, or resumes the saved job if it has not finished.
+    A saved job that succeeded is returned as it is, since starting another job is paid for again, unless force is set.
+
+    Args:
+        client: OpenAI client (or the openai module) exposing the files and fine-tuning endpoints
+        training_path (string): path of the chat formatted training file
+        validation_path (string): path of the chat formatted validation file
+        state_path (string): path of the job state file
+        force (bool): start a new job even if the saved job succeeded
+
+    Returns:
+        dict: job state with the job id, its status and the id of the last event seen
+    """
+    state = load_job_state(state_path)
+    if state is not None and state["status"] not in TERMINAL_STATUSES:
+        print(f"Resuming fine-tuning job {state['job_id']}")
+        return state
+    if state is not None and state["status"] == "succeeded" and not force:
+        print(f"Fine-tuning job {state['job_id']} already succeeded, pass --force to start a new one")
+        return state
+
+    training_file = upload_file(client, training_path)
+    validation_file = upload_file(client, validation_path)
+    job = client.fine_tuning.jobs.create(
+        model=BASE_MODEL,
+        training_file=training_file,
+        validation_file=validation_file,
+        suffix=MODEL_SUFFIX,
+    )
+    state = {
+        "job_id": job.id,
+        "status": job.status,
+        "training_file": training_file,
+        "validation_file": validation_file,
+        "last_event_id": None,
+        "fine_tuned_model": None,
+    }
+    save_job_state(state, state_path)
+    print(f"Fine-tuning job started with ID: {job.id}")
+    return state
+
+
+def fetch_new_events(client, job_id, last_event_id=None):
+    """
+    Fetches the events of a job created since the last event seen.
+    The API lists events newest first and pages backwards with after=, so pages are read until the last seen event turns up.
+
+    Args:
+        client: OpenAI client (or the openai module) exposing the fine-tuning endpoints
+        job_id (string): id of the fine-tuning job
+        last_event_id (string): id of the newest event already seen, None to fetch every event
+
+    Returns:
+        list: new events, oldest first
+    """
+    events = []
+    after = None
+    while True:
+        if after is None:
+            page = client.fine_tuning.jobs.list_events(job_id, limit=EVENTS_PAGE_SIZE)
+        else:
+            page = client.fine_tuning.jobs.list_events(job_id, after=after, limit=EVENTS_PAGE_SIZE)
+        for event in page.data:
+            if event.id == last_event_id:
+                return events[::-1]
+            events.append(event)
+        if not page.data or not page.has_more:
+            return events[::-1]
+        after = page.data[-1].id
+
+
+def next_poll_interval(interval, had_events):
+    """
+    Returns the wait before the next poll, resetting it while the job is active and doubling it while it is quiet
+
+    Args:
+        interval (float): current wait in seconds
+        had_events (bool): whether the last poll returned new events
+    """
+    if had_events:
+        return MIN_POLL_INTERVAL
+    return min(interval * 2, MAX_POLL_INTERVAL)
+
+
+def save_fine_tuned_model(model_id, env_path=ENV_FILE):
+    """
+    Stores the fine-tuned model id as OPENAI_FINETUNED_MODEL, where handle_emotional_checkin reads it
+
+    Args:
+        model_id (string): id of the fine-tuned model
+        env_path (string): path of the .env file
+    """
+    if not os.path.exists(env_path):
+        open(env_path, 'a').close()
+    set_key(env_path, "OPENAI_FINETUNED_MODEL", model_id)
+    os.environ["OPENAI_FINETUNED_MODEL"] = model_id
+
+
+def track_job(client=openai, state=None, state_path=JOB_STATE_FILE, env_path=ENV_FILE, sleep=time.sleep):
+    """
+    Follows a fine-tuning job until it finishes, printing its new events as they arrive.
+    The job state is saved after every poll, so tracking picks up where it stopped.
+
+    Args:
+        client: OpenAI client (or the openai module) exposing the fine-tuning endpoints
+        state (dict): job state from start_job, read from state_path if None
+        state_path (string): path of the job state file
+        env_path (string): path of the .env file the resulting model id is written to
+        sleep (callable): function used to wait between polls
+
+    Returns:
+        dict: the final job state
+    """
+    if state is None:
+        state = load_job_state(state_path)
+        if state is None:
+            raise ValueError(f"No fine-tuning job found in {state_path}")
+
+    interval = MIN_POLL_INTERVAL
+    while True:
+        # Retrieve the job before its events, so the events leading to a final status are printed too
+        job = client.fine_tuning.jobs.retrieve(state["job_id"])
+        events = fetch_new_events(client, state["job_id"], state["last_event_id"])
+        for event in events:
+            print(event.message)
+        if events:
+            state["last_event_id"] = events[-1].id
+
+        if job.status != state["status"]:
+            print(f"Job Status: {job.status}")
+        state["status"] = job.status
+        state["fine_tuned_model"] = job.fine_tuned_model
+        save_job_state(state, state_path)
+
+        if job.status in TERMINAL_STATUSES:
+            break
+        interval = next_poll_interval(interval, bool(events))
+        sleep(interval)
+
+    if state["status"] == "succeeded" and state["fine_tuned_model"]:
+        save_fine_tuned_model(state["fine_tuned_model"], env_path)
+        print(f"Saved fine-tuned model {state['fine_tuned_model']} to {env_path}")
+    return state
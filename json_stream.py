@@ -0,0 +1,105 @@
+import json
+
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON document which arrives in pieces (e.g. a streamed model response) and reports
+    values as soon as they are complete, instead of waiting for the whole document.
+    Text before the first '{' or '[' (such as a ```json code fence) and after the end of the document is ignored.
+
+    Args:
+        emit_depth (int): deepest path to report values for, 1 reports the members of the top level object
+    """
+    def __init__(self, emit_depth=1):
+        self.emit_depth = emit_depth
+        self.buffer = ''
+        self.position = 0
+        self.stack = []
+        self.started = False
+        self.done = False
+        self.in_string = False
+        self.escaped = False
+        self.string_start = None
+        self.string_is_key = False
+        self.scalar_start = None
+
+    def child_path(self):
+        """
+        Path of the next value inside the innermost open object or array
+        """
+        frame = self.stack[-1]
+        return frame['path'] + ((frame['key'],) if frame['type'] == '{' else (frame['index'],))
+
+    def complete(self, path, start, end, events):
+        """
+        Records a finished value if it is shallow enough to be reported
+        """
+        if 0 < len(path) <= self.emit_depth:
+            try:
+                events.append((path, json.loads(self.buffer[start:end])))
+            except ValueError:
+                # Malformed values are skipped, the caller treats them as missing
+                pass
+
+    def feed(self, text):
+        """
+        Adds the next piece of the document
+
+        Args:
+            text (string): the next characters of the document
+
+        Returns:
+            [(tuple, object)]: (path, value) pairs completed by this piece, e.g. (('name',), 'Calculus Exam')
+        """
+        events = []
+        self.buffer += text
+        while self.position < len(self.buffer) and not self.done:
+            char = self.buffer[self.position]
+            index = self.position
+            self.position += 1
+
+            if not self.started:
+                if char in '{[':
+                    self.started = True
+                    self.stack.append({'type': char, 'path': (), 'key': None, 'index': 0, 'start': index})
+                continue
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.string_is_key:
+                        self.stack[-1]['key'] = json.loads(self.buffer[self.string_start:index + 1])
+                    else:
+                        self.complete(self.child_path(), self.string_start, index + 1, events)
+                continue
+
+            if self.scalar_start is not None:
+                if char not in ',}] \t\r\n':
+                    continue
+                self.complete(self.child_path(), self.scalar_start, index, events)
+                self.scalar_start = None
+
+            frame = self.stack[-1]
+            if char == '"':
+                self.in_string = True
+                self.string_start = index
+                self.string_is_key = frame['type'] == '{' and frame['key'] is None
+            elif char in '{[':
+                self.stack.append({'type': char, 'path': self.child_path(), 'key': None, 'index': 0, 'start': index})
+            elif char in '}]':
+                self.stack.pop()
+                self.complete(frame['path'], frame['start'], index + 1, events)
+                if not self.stack:
+                    self.done = True
+            elif char == ',':
+                if frame['type'] == '{':
+                    frame['key'] = None
+                else:
+                    frame['index'] += 1
+            elif char not in ': \t\r\n':
+                self.scalar_start = index
+        return events
@@ -26,5 +26,5 @@ def prepare_data(split_name, output_file):
     # Run this command: openai tools fine_tunes.prepare_data -f empatheticdialogues_preprocessed.jsonl to prepare the data for fine-tuning,
     # Answer Y to all the questions asked, and the data will be split to train and validation sets.
 
-    # After running the above command, upload the files to the OpenAI platform to fine-tune the model by running the following command:
-    # openai api files.create -f "replace this with".jsonl -p fine-tune
+    # After running the above command, run python preprocess_dataset.py to convert both splits to chat format,
+    # then run python fine_tune.py to upload them and fine-tune the model.
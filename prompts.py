@@ -0,0 +1,163 @@
+import tiktoken
+
+
+# Every system prompt the coach sends, by (name, version). Prompts hold only static text so they form an
+# identical prefix on every request (which the provider can cache); the date and user input are added after them.
+PROMPTS = {
+    ("assignments_extraction", 1): """
+                Extract every assignment or exam the user mentions and respond in JSON format.
+
+                Return JSON with an "assignments" list. Each assignment has these fields (null if the user did not say):
+                - name: descriptive name for the assignment
+                - due date: YYYY-MM-DD
+                - due time: HH:MM in 24-hour format
+                - time_allocated: minutes (convert from hours)
+                - sessions: number
+                Example Response:
+                {"assignments": [
+                    {"name": "Calculus Exam", "due date": "2024-03-19", "due time": "14:00", "time_allocated": 180, "sessions": 3},
+                    {"name": "History Essay", "due date": "2024-03-22", "due time": "23:00", "time_allocated": 360, "sessions": 2}
+                ]}
+            """,
+    ("assignments_extraction", 2): (
+        "Extract every assignment or exam in the user's message as JSON {\"assignments\": [...]}. "
+        "Use null for anything not given.\n"
+        "name: descriptive name; due date: YYYY-MM-DD; due time: HH:MM 24h; "
+        "time_allocated: minutes (convert hours); sessions: integer.\n"
+        "Resolve relative dates (e.g. next Saturday) from today's date."
+    ),
+    ("field_extraction", 1): """
+                Extract the requested fields from the response and format in JSON.
+
+                When processing relative dates (like 'next Saturday' or 'tomorrow'):
+                - Use current date as reference
+
+                Use the same format as the main dialogue:
+                - due date: YYYY-MM-DD
+                - due time: HH:MM in 24-hour format
+                - time_allocated: minutes (convert from hours if needed)
+                - sessions: number
+
+                Return only these fields in JSON format.
+            """,
+    ("field_extraction", 2): (
+        "Extract the requested assignment fields from the user's answer as JSON. Use null for anything not given.\n"
+        "due date: YYYY-MM-DD; due time: HH:MM 24h; time_allocated: minutes (convert hours); sessions: integer.\n"
+        "Resolve relative dates (e.g. tomorrow) from today's date."
+    ),
+    ("emotion_detection", 1): "Detect the emotions in the input in a couple words.",
+    ("emotion_classification", 1): (
+        "You are an assistant trained to detect emotions. "
+        "Based on the user's message, respond with a single word that represents the detected emotion."
+    ),
+    ("supportive_response", 1): (
+        "You are an empathetic AI coach. "
+        "Acknowledge the user's emotion and provide a supportive, encouraging response."
+    ),
+}
+
+# Version of each prompt used by the coach
+CURRENT_VERSIONS = {
+    "assignments_extraction": 2,
+    "field_extraction": 2,
+    "emotion_detection": 1,
+    "emotion_classification": 1,
+    "supportive_response": 1,
+}
+
+# Most prompt tokens a single call to each prompt should need, including the user's input
+TOKEN_BUDGETS = {
+    "assignments_extraction": 400,
+    "field_extraction": 250,
+    "emotion_detection": 150,
+    "emotion_classification": 150,
+    "supportive_response": 150,
+}
+
+# Prompt tokens counted per prompt name: {"calls": ..., "tokens": ..., "over_budget": ...}
+token_usage = {}
+
+_encoding = None
+
+
+def get_prompt(name, version=None):
+    """
+    Looks up a system prompt in the registry.
+
+    Args:
+        name (str): Name of the prompt
+        version (int): Version of the prompt, the current version if None
+
+    Returns:
+        str: The prompt text
+    """
+    return PROMPTS[(name, version or CURRENT_VERSIONS[name])]
+
+
+def build_messages(name, user_content, today=None, version=None):
+    """
+    Builds the messages for a call, with the static system prompt first and the dynamic parts after it.
+
+    Args:
+        name (str): Name of the prompt
+        user_content (str): The user's message
+        today (date): Date to resolve relative dates against, left out if None
+        version (int): Version of the prompt, the current version if None
+
+    Returns:
+        list: Messages for the chat completions API
+    """
+    messages = [{"role": "system", "content": get_prompt(name, version)}]
+    if today is not None:
+        messages.append({"role": "system", "content": f"Today is {today.strftime('%A, %Y-%m-%d')}."})
+    messages.append({"role": "user", "content": user_content})
+    return messages
+
+
+def get_encoding():
+    """
+    Returns the tokenizer used by gpt-4o-mini, loading it on first use.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+        except KeyError:
+            _encoding = tiktoken.get_encoding("o200k_base")
+    return _encoding
+
+
+def count_message_tokens(messages):
+    """
+    Counts the prompt tokens of a list of chat messages, including the per-message overhead.
+
+    Args:
+        messages (list): Messages for the chat completions API
+
+    Returns:
+        int: Number of prompt tokens
+    """
+    encoding = get_encoding()
+    # Every message costs 3 tokens on top of its content, and the reply is primed with 3 more
+    return sum(3 + len(encoding.encode(message["content"])) for message in messages) + 3
+
+
+def check_prompt_budget(name, messages):
+    """
+    Counts the tokens of a call, records them and warns if the call goes over the prompt's budget.
+
+    Args:
+        name (str): Name of the prompt the messages were built from
+        messages (list): Messages about to be sent
+
+    Returns:
+        int: Number of prompt tokens
+    """
+    tokens = count_message_tokens(messages)
+    usage = token_usage.setdefault(name, {"calls": 0, "tokens": 0, "over_budget": 0})
+    usage["calls"] += 1
+    usage["tokens"] += tokens
+    if tokens > TOKEN_BUDGETS[name]:
+        usage["over_budget"] += 1
+        print(f"Warning: {name} prompt used {tokens} tokens, over its budget of {TOKEN_BUDGETS[name]}.")
+    return tokens
@@ -0,0 +1,356 @@
+import datetime
+import json
+import os
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+from time_slots import CALENDAR_TIMEZONE, MINUTES_PER_DAY, MINUTES_PER_WEEK, to_minutes, from_minutes
+from availability_template import DAY_CODES
+
+
+# Local copy of the weekly recurring events on the coach calendar
+AVAILABILITY_FILE = 'availability.json'
+
+# RRULE parts the local expander understands, rules with any other part are expanded by Google
+SUPPORTED_RRULE_PARTS = {'FREQ', 'INTERVAL', 'BYDAY', 'UNTIL', 'COUNT', 'WKST'}
+
+
+def parse_ical_datetime(value, tz):
+    """
+    Parses an iCalendar DATE or DATE-TIME value (e.g. 20261020, 20261020T090000, 20261020T130000Z)
+
+    Args:
+        value (string): the value from an RRULE or EXDATE line
+        tz (ZoneInfo): timezone for values without a trailing Z
+
+    Returns:
+        date or datetime: a date for DATE values, an aware datetime for DATE-TIME values
+    """
+    if 'T' not in value:
+        return datetime.datetime.strptime(value, '%Y%m%d').date()
+    if value.endswith('Z'):
+        return datetime.datetime.strptime(value[:-1], '%Y%m%dT%H%M%S').replace(tzinfo=datetime.timezone.utc)
+    return datetime.datetime.strptime(value, '%Y%m%dT%H%M%S').replace(tzinfo=tz)
+
+
+def parse_rrule(line, tz):
+    """
+    Parses the supported subset of an RRULE line: FREQ=WEEKLY with BYDAY, INTERVAL, UNTIL and COUNT
+
+    Args:
+        line (string): recurrence line, e.g. "RRULE:FREQ=WEEKLY;BYDAY=MO,WE,FR;UNTIL=20261231T235959Z"
+        tz (ZoneInfo): timezone of the event the rule belongs to
+    """
+    parts = dict(part.split('=', 1) for part in line.split(':', 1)[1].split(';') if part)
+    if parts.get('FREQ') != 'WEEKLY' or not set(parts) <= SUPPORTED_RRULE_PARTS:
+        raise ValueError(f"Unsupported recurrence rule: {line}")
+
+    rule = {'interval': int(parts.get('INTERVAL', 1)), 'weekdays': None, 'until': None, 'count': None}
+    if 'BYDAY' in parts:
+        rule['weekdays'] = sorted(DAY_CODES.index(code[-2:]) for code in parts['BYDAY'].split(','))
+    if 'UNTIL' in parts:
+        until = parse_ical_datetime(parts['UNTIL'], tz)
+        if isinstance(until, datetime.date) and not isinstance(until, datetime.datetime):
+            # A date UNTIL includes every occurrence on that day
+            until = datetime.datetime.combine(until, datetime.time(23, 59), tzinfo=tz)
+        rule['until'] = to_minutes(until)
+    if 'COUNT' in parts:
+        rule['count'] = int(parts['COUNT'])
+    return rule
+
+
+def parse_exdate(line, tz):
+    """
+    Parses an EXDATE line into the excluded occurrence starts and the excluded days
+
+    Args:
+        line (string): exclusion line, e.g. "EXDATE;TZID=America/New_York:20261020T090000,20261027T090000"
+        tz (ZoneInfo): timezone of the event the line belongs to
+
+    Returns:
+        (set, set): excluded starts in minutes since the UTC epoch, excluded dates
+    """
+    params, values = line.split(':', 1)
+    for param in params.split(';')[1:]:
+        if param.startswith('TZID='):
+            tz = ZoneInfo(param[len('TZID='):])
+
+    starts, days = set(), set()
+    for value in values.split(','):
+        parsed = parse_ical_datetime(value.strip(), tz)
+        if isinstance(parsed, datetime.datetime):
+            starts.add(to_minutes(parsed))
+        else:
+            days.add(parsed)
+    return starts, days
+
+
+def parse_event_bound(bound, tz):
+    """
+    Converts the start or end of an event resource into a naive wall time in tz
+
+    Args:
+        bound (dict): the 'start' or 'end' of an event resource
+        tz (ZoneInfo): timezone of the event
+    """
+    if 'dateTime' not in bound:
+        return datetime.datetime.fromisoformat(bound['date'])
+    value = datetime.datetime.fromisoformat(bound['dateTime'].replace('Z', '+00:00'))
+    if value.tzinfo is not None:
+        value = value.astimezone(tz).replace(tzinfo=None)
+    return value
+
+
+class RecurringEvent:
+    """
+    A weekly recurring calendar event which can be expanded into busy intervals without the API
+
+    Args:
+        start (datetime): naive wall time of the first occurrence in tz
+        duration (int): length of each occurrence in minutes
+        tz (ZoneInfo): timezone the event repeats in
+        rule (dict): parsed RRULE from parse_rrule
+        exdates (set): excluded occurrence starts in minutes since the UTC epoch
+        exdays (set): excluded dates
+    """
+    __slots__ = ('start', 'duration', 'tz', 'interval', 'weekdays', 'until', 'count', 'exdates', 'exdays')
+
+    def __init__(self, start, duration, tz, rule, exdates=(), exdays=()):
+        self.start = start
+        self.duration = duration
+        self.tz = tz
+        self.interval = rule['interval']
+        self.weekdays = rule['weekdays'] or [start.weekday()]
+        self.until = rule['until']
+        self.count = rule['count']
+        self.exdates = set(exdates)
+        self.exdays = set(exdays)
+
+    @classmethod
+    def from_resource(cls, event, calendar_timezone=CALENDAR_TIMEZONE):
+        """
+        Builds a recurring event from a Google Calendar event resource with a 'recurrence' list.
+        Events without a timeZone (such as all day events) repeat in the calendar's timezone, like parse_event_minutes reads them.
+        """
+        tz = ZoneInfo(event['start']['timeZone']) if event['start'].get('timeZone') else calendar_timezone
+        start = parse_event_bound(event['start'], tz)
+        end = parse_event_bound(event['end'], tz)
+        duration = to_minutes(end.replace(tzinfo=tz)) - to_minutes(start.replace(tzinfo=tz))
+
+        rule, exdates, exdays = None, set(), set()
+        for line in event.get('recurrence', []):
+            if line.startswith('RRULE') and rule is None:
+                rule = parse_rrule(line, tz)
+            elif line.startswith('EXDATE'):
+                starts, days = parse_exdate(line, tz)
+                exdates |= starts
+                exdays |= days
+            else:
+                # RDATE, EXRULE or a second RRULE
+                raise ValueError(f"Unsupported recurrence line: {line}")
+        if rule is None:
+            raise ValueError(f"Event {event.get('id')} has no RRULE")
+        return cls(start, duration, tz, rule, exdates, exdays)
+
+    def first_start(self):
+        """
+        Start of the first occurrence in minutes since the UTC epoch
+        """
+        return to_minutes(self.start.replace(tzinfo=self.tz))
+
+    def is_regular(self):
+        """
+        Checks whether the event repeats every week forever, so it can be folded into a week pattern
+        """
+        return (self.interval == 1 and self.until is None and self.count is None
+                and not self.exdates and not self.exdays)
+
+    def pattern_entries(self):
+        """
+        (timezone, weekday, minute of day, duration) entries describing one week of this event
+        """
+        minute = self.start.hour * 60 + self.start.minute
+        return [(self.tz.key, weekday, minute, self.duration) for weekday in self.weekdays]
+
+    def occurrences(self, window_start, window_end):
+        """
+        Yields the (start, end) minute intervals of the occurrences overlapping [window_start, window_end)
+
+        Args:
+            window_start (int): start of the window in minutes since the UTC epoch
+            window_end (int): end of the window in minutes since the UTC epoch
+        """
+        first_day = self.start.date()
+        monday = first_day - datetime.timedelta(days=first_day.weekday())
+        week = 0
+        if self.count is None:
+            # Without COUNT the weeks before the window can be skipped instead of walked through
+            window_day = (datetime.datetime.fromtimestamp((window_start - self.duration) * 60, self.tz)).date()
+            skipped = max(0, (window_day - monday).days // 7 - 1)
+            week = skipped - skipped % self.interval
+
+        index = 0
+        while True:
+            week_monday = monday + datetime.timedelta(weeks=week)
+            for weekday in self.weekdays:
+                day = week_monday + datetime.timedelta(days=weekday)
+                if day < first_day:
+                    continue
+                start = to_minutes(datetime.datetime.combine(day, self.start.time(), tzinfo=self.tz))
+                if self.until is not None and start > self.until:
+                    return
+                if self.count is not None and index >= self.count:
+                    return
+                index += 1
+                if start >= window_end:
+                    return
+                if start in self.exdates or day in self.exdays:
+                    continue
+                if start + self.duration > window_start:
+                    yield start, start + self.duration
+            week += self.interval
+
+
+def can_expand_locally(resource, calendar_timezone=CALENDAR_TIMEZONE):
+    """
+    Checks whether a recurring event resource only uses the recurrence rules RecurringEvent can expand
+
+    Args:
+        resource (dict): Google Calendar event resource with a 'recurrence' list
+        calendar_timezone (ZoneInfo): timezone of the calendar, used for events without their own timeZone
+    """
+    try:
+        RecurringEvent.from_resource(resource, calendar_timezone)
+    except (ValueError, KeyError):
+        return False
+    return True
+
+
+@lru_cache(maxsize=32)
+def week_pattern_offsets(pattern):
+    """
+    Merges a week pattern into sorted (minute after Monday midnight, duration) offsets, cached per pattern
+
+    Args:
+        pattern (tuple): sorted (weekday, minute of day, duration) entries in one timezone
+    """
+    offsets = []
+    for start, end in sorted((weekday * MINUTES_PER_DAY + minute, weekday * MINUTES_PER_DAY + minute + duration)
+                             for weekday, minute, duration in pattern):
+        if offsets and start <= offsets[-1][1]:
+            offsets[-1] = (offsets[-1][0], max(offsets[-1][1], end))
+        else:
+            offsets.append((start, end))
+    return tuple((start, end - start) for start, end in offsets)
+
+
+@lru_cache(maxsize=256)
+def expand_pattern_week(tz_name, pattern, monday):
+    """
+    Converts one week of a week pattern into busy intervals, cached per pattern and week
+
+    Args:
+        tz_name (string): timezone the pattern's wall times are in
+        pattern (tuple): sorted (weekday, minute of day, duration) entries
+        monday (date): Monday of the week being expanded
+    """
+    tz = ZoneInfo(tz_name)
+    midnight = datetime.datetime.combine(monday, datetime.time())
+    intervals = []
+    for offset, duration in week_pattern_offsets(pattern):
+        # Go through the wall clock so occurrences stay at the same local time across DST changes
+        start = to_minutes((midnight + datetime.timedelta(minutes=offset)).replace(tzinfo=tz))
+        intervals.append((start, start + duration))
+    return tuple(intervals)
+
+
+class RecurrenceStore:
+    """
+    Local store of the weekly recurring events on a calendar, expanded into busy intervals in memory
+
+    Args:
+        resources ([dict]): Google Calendar event resources with a 'recurrence' list
+        calendar_timezone (ZoneInfo): timezone of the calendar, used for events without their own timeZone
+    """
+    def __init__(self, resources=(), calendar_timezone=CALENDAR_TIMEZONE):
+        self.calendar_timezone = calendar_timezone
+        self.resources = []
+        self.events = []
+        for resource in resources:
+            self.add(resource)
+
+    def add(self, resource):
+        """
+        Adds or replaces (by id) a recurring event resource
+        """
+        self.resources = [stored for stored in self.resources if stored.get('id') != resource.get('id')]
+        self.resources.append({key: resource[key] for key in ('id', 'summary', 'start', 'end', 'recurrence')
+                               if key in resource})
+        self.events = [RecurringEvent.from_resource(stored, self.calendar_timezone) for stored in self.resources]
+
+    def exclude(self, event_id, original_start):
+        """
+        Excludes one occurrence of a stored event, e.g. because it was moved or cancelled on the calendar
+
+        Args:
+            event_id (string): id of the recurring event
+            original_start (int): start of the excluded occurrence in minutes since the UTC epoch
+        """
+        for resource, event in zip(self.resources, self.events):
+            if resource.get('id') == event_id and original_start not in event.exdates:
+                event.exdates.add(original_start)
+                # Also record it as an EXDATE so the exclusion is kept in the availability file
+                value = from_minutes(original_start).strftime('%Y%m%dT%H%M%SZ')
+                resource['recurrence'] = resource.get('recurrence', []) + [f"EXDATE:{value}"]
+
+    def busy_intervals(self, window_start, window_end):
+        """
+        Yields the busy (start, end) minute intervals of every stored event overlapping the window
+
+        Args:
+            window_start (int): start of the window in minutes since the UTC epoch
+            window_end (int): end of the window in minutes since the UTC epoch
+        """
+        patterns = {}
+        for event in self.events:
+            # Events starting within the last week are expanded on their own so nothing lands before their start
+            if event.is_regular() and event.first_start() <= window_start - MINUTES_PER_WEEK:
+                for tz_name, weekday, minute, duration in event.pattern_entries():
+                    patterns.setdefault(tz_name, set()).add((weekday, minute, duration))
+            else:
+                yield from event.occurrences(window_start, window_end)
+
+        for tz_name, entries in patterns.items():
+            pattern = tuple(sorted(entries))
+            tz = ZoneInfo(tz_name)
+            # Start a week early so intervals running into the window from the previous week are included
+            first_day = datetime.datetime.fromtimestamp(window_start * 60, tz).date() - datetime.timedelta(days=7)
+            monday = first_day - datetime.timedelta(days=first_day.weekday())
+            while to_minutes(datetime.datetime.combine(monday, datetime.time(), tzinfo=tz)) < window_end:
+                for start, end in expand_pattern_week(tz_name, pattern, monday):
+                    if end > window_start and start < window_end:
+                        yield start, end
+                monday += datetime.timedelta(days=7)
+
+    def save(self, calendar_id, path=AVAILABILITY_FILE):
+        """
+        Writes the stored events to the local availability file
+        """
+        with open(path, 'w') as f:
+            json.dump({"calendar_id": calendar_id, "events": self.resources}, f)
+
+
+def load_recurrence_store(calendar_id, path=AVAILABILITY_FILE):
+    """
+    Reads the local availability file, returning None if there is none for the given calendar
+
+    Args:
+        calendar_id (string): id of the calendar the store belongs to
+        path (string): path of the availability file
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if data.get("calendar_id") != calendar_id:
+        return None
+    return RecurrenceStore(data.get("events", []))
@@ -8,11 +8,20 @@ import datetime
 import time
 import sys
 import json
-import re
+import math
+import hashlib
+from calendar_requests import CALENDAR_UNREACHABLE, execute_request, execute_batch
+from time_slots import CALENDAR_TIMEZONE, WindowedBusyIntervals, Session, to_minutes, from_minutes, parse_event_minutes
+from recurrence import RecurrenceStore, can_expand_locally, load_recurrence_store
+from availability_template import (DAYS_OF_WEEK, DAY_CODES, load_week_template, parse_time_ranges,
+                                   to_week_intervals, merge_week_intervals, group_recurring_slots)
 
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Default number of days ahead events are read for
+PLANNING_HORIZON_DAYS = 30
+
 
 def slow_print(text, delay=0.01):
     """
@@ -36,37 +45,47 @@ def create_unavailable_events(service, calendar_id):
         service (string): Resource object for interacting with Google's calendar API
         calendar_id (string): id of calendar to write to
     """
-   days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-
-
    slow_print("Since you are creating a new calendar, please enter times you cannot study. Use this for times when you are sleeping or away.")
-   slow_print("Please enter your information by the following example format for the prompted day: 8:15AM-12:30PM, 1:00PM-3:00PM")
-
-
-   for day in days_of_week:
-       # Get unavailable times for the day from the user
-       slow_print(f"Enter unavailable times for {day}: ")
-       time_slots = input()
-       unavailable_slots = parse_time_slots(time_slots)
+   slow_print("If you have a weekly availability file (lines like 'Monday, Wednesday: 8:15AM-12:30PM, 11:00PM-7:00AM'), enter its path. Otherwise press Enter: ")
+   template_path = input().strip()
+
+   unavailable_slots = []
+   if template_path:
+       while True:
+           try:
+               unavailable_slots = load_week_template(template_path)
+               break
+           except (OSError, ValueError) as error:
+               slow_print(f"Could not read that file ({error}). Enter the path again, or press Enter to type your times: ")
+               template_path = input().strip()
+               if not template_path:
+                   break
 
+   if not template_path:
+       slow_print("Please enter your information by the following example format for the prompted day: 8:15AM-12:30PM, 1:00PM-3:00PM")
+       slow_print("Leave the line empty if you are free all day.")
+       for day, day_name in enumerate(DAYS_OF_WEEK):
+           # Get unavailable times for the day from the user
+           slow_print(f"Enter unavailable times for {day_name}: ")
+           time_slots = input()
+           unavailable_slots.extend(to_week_intervals(day, parse_time_slots(time_slots)))
 
-       slow_print(f"Creating events for {day}")
-       # Create recurring events for each unavailable time slot
-       create_recurrence_events(service, calendar_id, day[:2].upper(), unavailable_slots)
+   slow_print("Creating your unavailable times...")
+   create_weekly_unavailable_events(service, calendar_id, unavailable_slots)
 
 
-def create_event(service, calendar_id, start_datetime, end_datetime, day):
+def build_unavailable_event(calendar_id, start_datetime, end_datetime, day):
     """
-    Helper function to create a unavailable event
+    Builds the body of a weekly recurring unavailable event
     
     Args:
-        service (string): Resource object for interacting with Google's calendar API
-        calendar_id (string): id of calendar to write to
-        start_datetime (datetime): start time of event being made
-        end_datetime (datetime): end time of event being made
-        day (string): formatted string representing the day of the week an event should be on
+        calendar_id (string): id of calendar the event belongs to
+        start_datetime (datetime): start time of the first occurrence
+        end_datetime (datetime): end time of the first occurrence
+        day (string): formatted string of the days of the week the event repeats on (e.g. "MO,WE,FR")
     """
-    event = {
+    duration = int((end_datetime - start_datetime).total_seconds() // 60)
+    return {
         'summary': 'Unavailable Time',
         'start': {
             'dateTime': start_datetime.isoformat(),
@@ -79,54 +98,101 @@ def create_event(service, calendar_id, start_datetime, end_datetime, day):
         'recurrence': [
             f'RRULE:FREQ=WEEKLY;BYDAY={day}'
         ],
+        'id': make_event_id(calendar_id, 'Unavailable Time', day, start_datetime.time().isoformat(), duration),
     }
-    service.events().insert(calendarId=calendar_id, body=event).execute()
-    slow_print(f"Created event from {start_datetime} to {end_datetime} for {day}")
 
 
-def create_recurrence_events(service, calendar_id, day, unavailable_slots):
+def store_unavailable_events(calendar_id, events):
+    """
+    Adds written recurring unavailable events to the local recurrence store so they can be expanded without the API
+    
+    Args:
+        calendar_id (string): id of calendar the events were written to
+        events ([dict]): bodies of the written events
+    """
+    store = load_recurrence_store(calendar_id) or RecurrenceStore()
+    for event in events:
+        store.add(event)
+    store.save(calendar_id)
+
+
+def create_weekly_unavailable_events(service, calendar_id, unavailable_slots):
    """
-    Creates reoccuring events with the given information
+    Writes a week of unavailable times as the fewest weekly recurring events, sent in a single batch.
+    Overlapping or touching slots are merged first, and slots that start at the same time and last
+    equally long on several days share one event (e.g. BYDAY=MO,WE,FR).
     
     Args:
         service (string): Resource object for interacting with Google's calendar API
         calendar_id (string): id of calendar to write to
-        day (string): formatted string representing the day of the week an event should be on
-        unavailable_slots ([string]): array of formatted strings holding the time slots for the unavailable times
+        unavailable_slots ([(int, int)]): unavailable (start, end) minutes after Monday midnight
     """
-   # Get the current date and weekday
    today = datetime.date.today()
-   today_weekday = today.weekday()  # Monday=0, Sunday=6
-   target_weekday = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU'].index(day)
-
-
-   # Calculate the difference in days
-   days_ahead = (target_weekday - today_weekday) % 7
-   date_of_slots = today if days_ahead == 0 else today + datetime.timedelta(days=days_ahead)
-
+   events = []
+   for days, start, duration in group_recurring_slots(merge_week_intervals(unavailable_slots)):
+       # The first occurrence is the next day of the group, starting today
+       days_ahead = min((day - today.weekday()) % 7 for day in days)
+       start_datetime = datetime.datetime.combine(today + datetime.timedelta(days=days_ahead), datetime.time()) \
+           + datetime.timedelta(minutes=start)
+       end_datetime = start_datetime + datetime.timedelta(minutes=duration)
+       byday = ','.join(DAY_CODES[day] for day in days)
+       events.append(build_unavailable_event(calendar_id, start_datetime, end_datetime, byday))
+
+   requests = [service.events().insert(calendarId=calendar_id, body=event) for event in events]
+   results = execute_batch(service, requests, calendar_id)
+
+   written = []
+   for event, (response, error) in zip(events, results):
+       if isinstance(error, HttpError) and error.resp.status == 409:
+           # Already written by an earlier attempt, overwrite it
+           try:
+               execute_request(service.events().update(calendarId=calendar_id, eventId=event['id'],
+                                                       body=dict(event, status='confirmed')), calendar_id)
+           except HttpError as update_error:
+               print(f"An error occurred: {update_error}")
+               continue
+       elif error is not None:
+           print(f"An error occurred: {error}")
+           continue
+       written.append(event)
+       slow_print(f"Created event from {event['start']['dateTime']} to {event['end']['dateTime']} for {event['recurrence'][0].split('BYDAY=')[1]}")
+   store_unavailable_events(calendar_id, written)
 
-   for start, end in unavailable_slots:
-        # If the event spans across midnight, split into two events
-        if start > end:
-            # First event: from start_time to midnight of the current day
-            start_datetime = datetime.datetime.combine(date_of_slots, start)
-            end_datetime = datetime.datetime.combine(date_of_slots, datetime.time(23, 59))
-            create_event(service, calendar_id, start_datetime, end_datetime, day)
 
-            # Second event: from midnight to end_time of the next day
-            next_day = date_of_slots + datetime.timedelta(days=1)
-            start_datetime = datetime.datetime.combine(next_day, datetime.time(0, 0))
-            end_datetime = datetime.datetime.combine(next_day, end)
-            next_day_name = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU'][(target_weekday + 1) % 7]
-            create_event(service, calendar_id, start_datetime, end_datetime, next_day_name)
-        else:
-            # Normal event creation
-            start_datetime = datetime.datetime.combine(date_of_slots, start)
-            end_datetime = datetime.datetime.combine(date_of_slots, end)
-            create_event(service, calendar_id, start_datetime, end_datetime, day)
+def make_event_id(calendar_id, *parts):
+    """
+    Builds a deterministic event id so that writing the same event twice targets the same calendar entry
+    
+    Args:
+        calendar_id (string): id of calendar the event belongs to
+        parts ([object]): values identifying the event within the calendar
+    """
+    key = '|'.join(str(part) for part in (calendar_id,) + parts)
+    # Hex digits are a subset of the base32hex alphabet Google requires for event ids
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
 
 
-def create_study_event(service, calendar_id, assignment_name, start_time, end_time):
+def upsert_event(service, calendar_id, event):
+    """
+    Inserts an event with a preset id, overwriting the existing event if that id is already taken
+    
+    Args:
+        service (string): Resource object for interacting with Google's calendar API
+        calendar_id (string): id of calendar to write to
+        event (dict): event body including its 'id'
+    """
+    try:
+        return execute_request(service.events().insert(calendarId=calendar_id, body=event), calendar_id)
+    except HttpError as error:
+        if error.resp.status != 409:
+            raise
+        # A retry or another writer already created it (or it was deleted and is still reserved), so overwrite it
+        body = dict(event, status='confirmed')
+        return execute_request(service.events().update(calendarId=calendar_id, eventId=event['id'], body=body),
+                               calendar_id)
+
+
+def create_study_event(service, calendar_id, assignment_name, start_time, end_time, session_index=0):
    """
     Creates a study event for the given time slot (creates singular non repeating event)
     
@@ -136,9 +202,10 @@ def create_study_event(service, calendar_id, assignment_name, start_time, end_ti
         assignment_name (string): name of the assignment which's slots are being created
         start_datetime (datetime): start time of event being made
         end_datetime (datetime): end time of event being made
+        session_index (int): position of the session among the sessions of the assignment
     """
-   start_time_utc = start_time.replace(tzinfo=datetime.timezone.utc)
-   end_time_utc = end_time.replace(tzinfo=datetime.timezone.utc)
+   start_time_utc = start_time.astimezone(datetime.timezone.utc)
+   end_time_utc = end_time.astimezone(datetime.timezone.utc)
   
    event = {
        'summary': f'Study for {assignment_name}',
@@ -151,10 +218,11 @@ def create_study_event(service, calendar_id, assignment_name, start_time, end_ti
            'timeZone': 'UTC',
        },
        'colorId': 3,
+       'id': make_event_id(calendar_id, assignment_name, session_index, start_time_utc.isoformat()),
    }
   
    try:
-       service.events().insert(calendarId=calendar_id, body=event).execute()
+       upsert_event(service, calendar_id, event)
    except HttpError as error:
        print(f"An error occurred: {error}")
 
@@ -165,26 +233,15 @@ def parse_time_slots(time_slots):
     
     Args:
         time_slots (string): time slots entered in a specific format to be converted into unavailable times
+    
+    Returns:
+        [(int, int)]: (start, end) minutes after midnight, end <= start for slots spanning midnight
     """
-    pattern = r'(\d{1,2}:\d{2}[AP]M)-(\d{1,2}:\d{2}[AP]M)'
-
     while True:
-        time_ranges = re.findall(pattern, time_slots)
-
-        if time_ranges:
-            parsed_slots = []
-            for start, end in time_ranges:
-                start_time = datetime.datetime.strptime(start, "%I:%M%p").time()
-                end_time = datetime.datetime.strptime(end, "%I:%M%p").time()
-
-                if start_time >= end_time: 
-                    # Split into two segments: start to midnight, midnight to end
-                    parsed_slots.append((start_time, datetime.time(23, 59)))  
-                    parsed_slots.append((datetime.time(0, 0), end_time))     
-                else:
-                    parsed_slots.append((start_time, end_time)) 
-
-            return parsed_slots
+        time_ranges = parse_time_ranges(time_slots)
+
+        if time_ranges or not time_slots.strip():
+            return time_ranges
         else:
             slow_print("Incorrect format. Please enter the times in the correct format (e.g., 8:15AM-12:30PM, 1:00PM-3:00PM).")
             slow_print("Enter unavailable times: ")
@@ -208,9 +265,9 @@ def getOrAccessCoachCalendar(service):
        # Create a new calendar if no file exists
        calendar = {
            'summary': 'AICollegeCoach Schedule',
-           'timeZone': 'UTC'
+           'timeZone': CALENDAR_TIMEZONE.key
        }
-       created_calendar = service.calendars().insert(body=calendar).execute()
+       created_calendar = execute_request(service.calendars().insert(body=calendar), idempotent=False)
        calendar_id = created_calendar['id']
 
 
@@ -251,21 +308,22 @@ def authorization():
    return service
 
 
-def print_scheduled_events(service, calendar_id):
+def print_scheduled_events(service, calendar_id, days=PLANNING_HORIZON_DAYS):
    """
     Prints out all scheduled events
     
     Args:
         service (string): Resource object for interacting with Google's calendar API
         calendar_id (string): id of calendar to write to
+        days (int): number of days ahead to print events for
     """
-   # Get events from today to 30 days in the future
+   # Get events from today to the given number of days in the future
    now = datetime.datetime.utcnow().isoformat() + 'Z'
-   then = (datetime.datetime.utcnow() + datetime.timedelta(days=30)).isoformat() + 'Z'
+   then = (datetime.datetime.utcnow() + datetime.timedelta(days=days)).isoformat() + 'Z'
   
-   events_result = service.events().list(calendarId=calendar_id, timeMin=now,
-                                         timeMax=then, singleEvents=True,
-                                         orderBy='startTime').execute()
+   events_result = execute_request(service.events().list(calendarId=calendar_id, timeMin=now,
+                                                         timeMax=then, singleEvents=True,
+                                                         orderBy='startTime'), calendar_id)
    events = events_result.get('items', [])
 
 
@@ -277,140 +335,397 @@ def print_scheduled_events(service, calendar_id):
 
 
 
-def get_unavailable_times(service, calendar_id):
+def list_calendar_events(service, calendar_id, days=PLANNING_HORIZON_DAYS):
    """
-    Helper function to get unavailable times from the calendar
+    Fetches the events on the calendar from now to the given number of days in the future. Recurring events
+    are returned once with their recurrence rules (plus any changed or cancelled instances) and are expanded locally.
     
     Args:
         service (string): Resource object for interacting with Google's calendar API
-        calendar_id (string): id of calendar to write to
+        calendar_id (string): id of calendar to read from
+        days (int): number of days ahead to fetch events for
     """
    now = datetime.datetime.utcnow().isoformat() + 'Z'
-   then = (datetime.datetime.utcnow() + datetime.timedelta(days=30)).isoformat() + 'Z'
-  
-   events_result = service.events().list(calendarId=calendar_id, timeMin=now,
-                                         timeMax=then, singleEvents=True,
-                                         orderBy='startTime').execute()
-   events = events_result.get('items', [])
-   unavailable_times = []
+   then = (datetime.datetime.utcnow() + datetime.timedelta(days=days)).isoformat() + 'Z'
   
-   # Parse all unavailable times
+   return list_all_pages(service.events().list, calendar_id, calendarId=calendar_id, timeMin=now,
+                         timeMax=then, singleEvents=False, maxResults=2500)
+
+
+def list_all_pages(list_method, calendar_id, **params):
+   """
+    Runs a list request page by page until Google reports no further pages, so long horizons are never cut off
+    
+    Args:
+        list_method (callable): list method of a calendar resource, e.g. service.events().list
+        calendar_id (string): id of calendar the request targets
+        params (dict): parameters of the list request
+    
+    Returns:
+        [dict]: the items of every page
+    """
+   items = []
+   page_token = None
+   while True:
+       result = execute_request(list_method(pageToken=page_token, **params), calendar_id)
+       items.extend(result.get('items', []))
+       page_token = result.get('nextPageToken')
+       if not page_token:
+           return items
+
+
+def sync_recurrence_store(calendar_id, events):
+   """
+    Rebuilds the local store of recurring events from listed calendar events and saves it
+    
+    Args:
+        calendar_id (string): id of calendar the events belong to
+        events ([dict]): events returned by list_calendar_events
+    """
+   store = RecurrenceStore(event for event in events if 'recurrence' in event and can_expand_locally(event))
+
+   # Instances that were moved or cancelled on the calendar replace the regular occurrence
    for event in events:
-       start = event['start'].get('dateTime', event['start'].get('date'))
-       end = event['end'].get('dateTime', event['end'].get('date'))
-       start_dt = datetime.datetime.fromisoformat(start.rstrip('Z'))
-       end_dt = datetime.datetime.fromisoformat(end.rstrip('Z'))
-       start_dt = start_dt.replace(tzinfo=None)  # Remove timezone info
-       end_dt = end_dt.replace(tzinfo=None)  # Remove timezone info
-       unavailable_times.append((start_dt, end_dt))
-   return unavailable_times
-  
+       if 'recurringEventId' in event and 'originalStartTime' in event:
+           original = {'start': event['originalStartTime'], 'end': event['originalStartTime']}
+           store.exclude(event['recurringEventId'], parse_event_minutes(original)[0])
+   store.save(calendar_id)
+   return store
 
 
-def schedule_session(service, calendar_id, name, current_time, session_duration, unavailable_times):
+def list_event_instances(service, calendar_id, event_id, days=PLANNING_HORIZON_DAYS):
    """
-    Helper function to schedule a single session
+    Fetches the instances of a recurring event from now to the given number of days in the future, expanded by Google.
+    Used for recurring events whose rules the local expander does not support (e.g. FREQ=DAILY or RDATE).
     
     Args:
         service (string): Resource object for interacting with Google's calendar API
-        calendar_id (string): id of calendar to write to
+        calendar_id (string): id of calendar to read from
+        event_id (string): id of the recurring event
+        days (int): number of days ahead to fetch instances for
     """
-   while True:
-       session_end_time = current_time + datetime.timedelta(minutes=session_duration)
-       can_schedule = True
+   now = datetime.datetime.utcnow().isoformat() + 'Z'
+   then = (datetime.datetime.utcnow() + datetime.timedelta(days=days)).isoformat() + 'Z'
 
+   return list_all_pages(service.events().instances, calendar_id, calendarId=calendar_id, eventId=event_id,
+                         timeMin=now, timeMax=then, maxResults=2500)
 
-       for start, end in unavailable_times:
-           if (current_time >= start and current_time < end) or \
-              (session_end_time > start and session_end_time <= end) or \
-              (current_time <= start and session_end_time >= end):
-               can_schedule = False
-               current_time = end  # Move to the end of the unavailable slot
-               break
 
+def get_one_off_events(events):
+   """
+    Filters listed events down to the single (non recurring) events which are still on the calendar
+    
+    Args:
+        events ([dict]): events returned by list_calendar_events
+    """
+   return [event for event in events if 'recurrence' not in event and event.get('status') != 'cancelled']
 
-       if can_schedule:
-           create_study_event(service, calendar_id, name, current_time, session_end_time)
-           return session_end_time
 
+def is_study_event(event):
+   """
+    Checks whether an event is a study session made by create_study_event
+    
+    Args:
+        event (dict): event resource returned by the Google Calendar API
+    """
+   return str(event.get('colorId')) == '3' and event.get('summary', '').startswith('Study for ')
 
-       # If we can't schedule, we've moved current_time to the next available slot
-       # and will try again in the next iteration
 
+def get_unavailable_times(service, calendar_id, events=None, days=PLANNING_HORIZON_DAYS):
+   """
+    Helper function to get unavailable times from the calendar. Single events are read up front, while the
+    weekly recurring ones are expanded lazily a week at a time as planning reaches them.
+    
+    Args:
+        service (string): Resource object for interacting with Google's calendar API
+        calendar_id (string): id of calendar to write to
+        events ([dict]): already fetched events to use instead of listing the calendar again
+        days (int): number of days ahead to fetch single events for when listing the calendar
+    
+    Returns:
+        WindowedBusyIntervals: busy times as minute offsets from the UTC epoch
+    """
+   if events is None:
+       try:
+           events = list_calendar_events(service, calendar_id, days)
+       except CALENDAR_UNREACHABLE as error:
+           print(f"An error occurred: {error}")
+           return get_stored_unavailable_times(calendar_id)
 
+   store = sync_recurrence_store(calendar_id, events)
+   one_off_times = [parse_event_minutes(event) for event in get_one_off_events(events)]
 
-def dedicateAssignmentTimes(service, calendar_id, assignments):
+   # Recurring events the local expander cannot handle are expanded by Google instead
+   for event in events:
+       if 'recurrence' in event and event.get('status') != 'cancelled' and not can_expand_locally(event):
+           one_off_times.extend(parse_event_minutes(instance)
+                                for instance in list_event_instances(service, calendar_id, event['id'], days)
+                                if instance.get('status') != 'cancelled')
+   return WindowedBusyIntervals(store.busy_intervals, one_off_times)
+
+
+def get_stored_unavailable_times(calendar_id):
    """
-    Main function to dedicate assignment times
+    Gets unavailable times from the locally stored weekly availability only, for when the calendar cannot be reached
+    
+    Args:
+        calendar_id (string): id of calendar the availability was stored for
+    
+    Returns:
+        WindowedBusyIntervals: busy times as minute offsets from the UTC epoch
+    """
+   store = load_recurrence_store(calendar_id) or RecurrenceStore()
+   return WindowedBusyIntervals(store.busy_intervals)
+
+
+def get_study_sessions(events):
+   """
+    Groups the existing study sessions on the calendar by assignment name
+    
+    Args:
+        events ([dict]): events returned by list_calendar_events
+    """
+   study_sessions = {}
+   for event in get_one_off_events(events):
+       if not is_study_event(event):
+           continue
+       name = event['summary'][len('Study for '):]
+       start, end = parse_event_minutes(event)
+       study_sessions.setdefault(name, []).append(Session(start, end, event['id']))
+   for sessions in study_sessions.values():
+       sessions.sort(key=lambda x: x.start)
+   return study_sessions
+
+
+def move_study_event(service, calendar_id, event_id, start_time, end_time):
+   """
+    Moves an existing study event to a new time slot
     
     Args:
         service (string): Resource object for interacting with Google's calendar API
         calendar_id (string): id of calendar to write to
-        assignments ([obj]): array of assignment objects to convert into calendar blocked study sessions
+        event_id (string): id of the study event being moved
+        start_time (datetime): new start time of the event
+        end_time (datetime): new end time of the event
     """
-   unavailable_times = get_unavailable_times(service, calendar_id)
-   assignments.sort(key=lambda x: x['due date'])
-   current_time = datetime.datetime.now().replace(tzinfo=None, microsecond=0)
-   current_time = current_time.replace(minute=0, second=0) + datetime.timedelta(hours=1)
+   start_time_utc = start_time.astimezone(datetime.timezone.utc)
+   end_time_utc = end_time.astimezone(datetime.timezone.utc)
 
-   for assignment in assignments:
-       name = assignment['name']
-       due_date = datetime.datetime.combine(assignment['due date'], assignment['due time'])
-       total_minutes = assignment['time_allocated']
-       sessions = assignment['sessions']
-       session_duration = total_minutes // sessions
+   body = {
+       'start': {
+           'dateTime': start_time_utc.isoformat(),
+           'timeZone': 'UTC',
+       },
+       'end': {
+           'dateTime': end_time_utc.isoformat(),
+           'timeZone': 'UTC',
+       },
+   }
 
+   try:
+       execute_request(service.events().patch(calendarId=calendar_id, eventId=event_id, body=body), calendar_id)
+   except HttpError as error:
+       print(f"An error occurred: {error}")
 
-       slow_print(f"Scheduling {name} due on {due_date}")
 
+def delete_study_event(service, calendar_id, event_id):
+   """
+    Deletes a study event which is no longer part of the schedule
+    
+    Args:
+        service (string): Resource object for interacting with Google's calendar API
+        calendar_id (string): id of calendar to write to
+        event_id (string): id of the study event being deleted
+    """
+   try:
+       execute_request(service.events().delete(calendarId=calendar_id, eventId=event_id), calendar_id)
+   except HttpError as error:
+       print(f"An error occurred: {error}")
 
-       # Calculate available time slots and ideal spacing
-       time_until_due = due_date - current_time
-       if time_until_due.total_seconds() <= 0:
-           slow_print(f"Warning: The due date for {name} has already passed.")
+
+def keep_existing_sessions(existing_sessions, session_duration, sessions, current_time, due_date, unavailable_times, now=None):
+   """
+    Picks the existing study sessions of an assignment which still fit its details and can stay where they are
+    
+    Args:
+        existing_sessions ([Session]): sessions of the assignment already on the calendar, sorted by start time
+        session_duration (int): length of a single session in minutes
+        sessions (int): number of sessions the assignment should have
+        current_time (int): earliest time a new session may start, in minutes since the UTC epoch
+        due_date (int): time the assignment is due, in minutes since the UTC epoch
+        unavailable_times (WindowedBusyIntervals): busy slots the kept sessions must not overlap, updated in place
+        now (int): current time in minutes since the UTC epoch, defaults to current_time
+    """
+   if now is None:
+       now = current_time
+   kept = []
+   for session in existing_sessions:
+       if len(kept) == sessions:
+           break
+       if session.end - session.start != session_duration:
            continue
+       if session.end <= now or session.start > due_date:
+           continue
+       # Sessions under way or starting before current_time are already on the calendar, so they stay as they are
+       if session.start <= current_time or unavailable_times.is_free(session.start, session.end):
+           kept.append(session)
+           unavailable_times.add(session.start, session.end)
+   return kept
 
 
-       # Calculate ideal interval between sessions
-       interval_hours = time_until_due.total_seconds() / (3600 * (sessions + 1))
+def place_assignment_sessions(name, due_date, session_duration, sessions, current_time, unavailable_times, scheduled_sessions=0):
+   """
+    Finds time slots for the study sessions of an assignment without writing them to the calendar
+    
+    Args:
+        name (string): name of the assignment being scheduled
+        due_date (int): time the assignment is due, in minutes since the UTC epoch
+        session_duration (int): length of a single session in minutes
+        sessions (int): number of sessions the assignment should have
+        current_time (int): time planning starts from, in minutes since the UTC epoch
+        unavailable_times (WindowedBusyIntervals): busy slots to avoid, updated in place with the placed sessions
+        scheduled_sessions (int): number of sessions that are already on the calendar and kept
+    """
+   placed = []
 
+   # Calculate ideal interval between sessions
+   interval = (due_date - current_time) / (sessions + 1)
 
-       # Schedule each session
-       scheduled_sessions = 0
-       while scheduled_sessions < sessions:
-           # Calculate the ideal start time for this session
-           target_time = current_time + datetime.timedelta(hours=interval_hours * (scheduled_sessions + 1))
 
+   # Schedule each session
+   while scheduled_sessions < sessions:
+       # Calculate the ideal start time for this session, then find the next free 15-minute slot from it
+       target_time = current_time + math.ceil(interval * (scheduled_sessions + 1))
+       start_time = unavailable_times.next_free(max(current_time, target_time), session_duration, limit=due_date)
 
-           # Find the next available slot close to the target time
-           start_time = max(current_time, target_time)
-           while start_time <= due_date:
-               session_end_time = start_time + datetime.timedelta(minutes=session_duration)
 
+       # If no valid slot was found before the due date, log a warning
+       if start_time > due_date:
+           slow_print(f"Warning: Could not schedule all sessions for {name} before the due date.")
+           break
 
-               # Check if the time slot is available
-               if all(start_time >= end or session_end_time <= start for start, end in unavailable_times):
-                   # Schedule the session
-                   create_study_event(service, calendar_id, name, start_time, session_end_time)
-                   unavailable_times.append((start_time, session_end_time))
-                   unavailable_times.sort(key=lambda x: x[0])
-                   scheduled_sessions += 1
-                   break
+
+       placed.append(Session(start_time, start_time + session_duration))
+       unavailable_times.add(start_time, start_time + session_duration)
+       scheduled_sessions += 1
+
+   return placed
 
 
-               # Try the next 15-minute slot
-               start_time += datetime.timedelta(minutes=15)
+def diff_study_sessions(existing_sessions, kept, placed):
+   """
+    Computes the minimal set of calendar changes turning the existing sessions of an assignment into the new plan
+    
+    Args:
+        existing_sessions ([Session]): sessions of the assignment already on the calendar
+        kept ([Session]): existing sessions which stay where they are
+        placed ([Session]): newly planned sessions
+    
+    Returns:
+        dict: 'keep', 'move', 'add' and 'delete' lists describing the changes
+    """
+   kept_ids = {session.event_id for session in kept}
+   leftover = [session for session in existing_sessions if session.event_id not in kept_ids]
 
+   # Reuse leftover events for the new slots before creating or deleting anything
+   moves = [Session(session.start, session.end, old.event_id) for old, session in zip(leftover, placed)]
+   adds = placed[len(leftover):]
+   deletes = [session.event_id for session in leftover[len(placed):]]
+   return {'keep': kept, 'move': moves, 'add': adds, 'delete': deletes}
 
-               # Roll over to the next day if needed
-               if start_time.time() > datetime.time(23, 45):
-                   start_time = start_time.replace(hour=0, minute=0) + datetime.timedelta(days=1)
 
+def apply_session_changes(service, calendar_id, name, changes):
+   """
+    Applies a diff from diff_study_sessions to the calendar
+    
+    Args:
+        service (string): Resource object for interacting with Google's calendar API
+        calendar_id (string): id of calendar to write to
+        name (string): name of the assignment the changes belong to
+        changes (dict): changes returned by diff_study_sessions
+    """
+   for session in changes['move']:
+       move_study_event(service, calendar_id, session.event_id,
+                        from_minutes(session.start), from_minutes(session.end))
+   first_index = len(changes['keep']) + len(changes['move'])
+   for session_index, session in enumerate(changes['add'], first_index):
+       create_study_event(service, calendar_id, name, from_minutes(session.start),
+                          from_minutes(session.end), session_index)
+   for event_id in changes['delete']:
+       delete_study_event(service, calendar_id, event_id)
 
-           # If no valid slot was found before the due date, log a warning
-           if start_time > due_date:
-               slow_print(f"Warning: Could not schedule all sessions for {name} before the due date.")
-               break
+   slow_print(f"Kept {len(changes['keep'])}, moved {len(changes['move'])}, added {len(changes['add'])} "
+              f"and removed {len(changes['delete'])} sessions for {name}")
+
+
+def dedicateAssignmentTimes(service, calendar_id, assignments, incremental=False):
+   """
+    Main function to dedicate assignment times
+    
+    Args:
+        service (string): Resource object for interacting with Google's calendar API
+        calendar_id (string): id of calendar to write to
+        assignments ([obj]): array of assignment objects to convert into calendar blocked study sessions
+        incremental (bool): reconcile with the study sessions already on the calendar instead of adding new ones
+    """
+   # Read single events as far ahead as the last due date, the weekly availability is expanded as needed
+   days = PLANNING_HORIZON_DAYS
+   for assignment in assignments:
+       due_date = datetime.datetime.combine(assignment['due date'], assignment['due time'])
+       days = max(days, (due_date - datetime.datetime.now()).days + 2)
+   try:
+       events = list_calendar_events(service, calendar_id, days)
+   except CALENDAR_UNREACHABLE as error:
+       print(f"An error occurred: {error}")
+       events = None
+   existing = {}
+   if events is None:
+       # Without the calendar, plan around the locally stored weekly availability only
+       slow_print("Warning: Could not read the calendar, planning around your stored weekly availability only.")
+       unavailable_times = get_stored_unavailable_times(calendar_id)
+   else:
+       if incremental:
+           # Sessions of the assignments being scheduled are replanned, every other event stays busy time
+           names = {assignment['name'] for assignment in assignments}
+           existing = {name: sessions for name, sessions in get_study_sessions(events).items() if name in names}
+           events = [event for event in events
+                     if not (is_study_event(event) and event['summary'][len('Study for '):] in existing)]
+       unavailable_times = get_unavailable_times(service, calendar_id, events, days)
+   assignments.sort(key=lambda x: x['due date'])
+   # Plan in whole minutes since the UTC epoch, starting at the next full hour
+   now = to_minutes(datetime.datetime.now(datetime.timezone.utc))
+   current_time = (now // 60 + 1) * 60
+
+   for assignment in assignments:
+       name = assignment['name']
+       due_datetime = datetime.datetime.combine(assignment['due date'], assignment['due time'])
+       due_date = to_minutes(due_datetime)
+       total_minutes = assignment['time_allocated']
+       sessions = assignment['sessions']
+       session_duration = total_minutes // sessions
+
+
+       slow_print(f"Scheduling {name} due on {due_datetime}")
+
+
+       # Calculate available time slots and ideal spacing
+       if due_date <= current_time:
+           slow_print(f"Warning: The due date for {name} has already passed.")
+           continue
+
+
+       existing_sessions = existing.get(name, [])
+       kept = keep_existing_sessions(existing_sessions, session_duration, sessions,
+                                     current_time, due_date, unavailable_times, now)
+       placed = place_assignment_sessions(name, due_date, session_duration, sessions,
+                                          current_time, unavailable_times, len(kept))
+
+       if incremental:
+           apply_session_changes(service, calendar_id, name, diff_study_sessions(existing_sessions, kept, placed))
+       else:
+           for session_index, session in enumerate(placed, len(kept)):
+               create_study_event(service, calendar_id, name, from_minutes(session.start),
+                                  from_minutes(session.end), session_index)
 
 
-       slow_print(f"Finished scheduling {name}")
\ No newline at end of file
+       slow_print(f"Finished scheduling {name}")
@@ -0,0 +1,103 @@
+import datetime
+import pytest
+
+scheduler_logic = pytest.importorskip("scheduler_logic")
+from time_slots import to_minutes, parse_event_minutes
+
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeEvents:
+    """
+    Stand-in for service.events() serving a fixed list of events and the server side expansion of recurring ones
+    """
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, pageToken=None, **params):
+        return FakeRequest({'items': list(self.service.events_on_calendar)})
+
+    def instances(self, eventId, pageToken=None, **params):
+        self.service.instance_requests.append(eventId)
+        return FakeRequest({'items': self.service.expanded[eventId]})
+
+    def insert(self, calendarId, body):
+        self.service.inserted.append(body)
+        return FakeRequest(dict(body))
+
+
+class FakeService:
+    def __init__(self, events, expanded):
+        self.events_on_calendar = events
+        self.expanded = expanded
+        self.instance_requests = []
+        self.inserted = []
+
+    def events(self):
+        return FakeEvents(self)
+
+
+def daily_gym_calendar(days=10):
+    """
+    A calendar holding one daily recurring event, which the local weekly expander does not support
+    """
+    first = datetime.datetime.now(datetime.timezone.utc).replace(hour=7, minute=0, second=0, microsecond=0)
+    gym = {
+        'id': 'gym',
+        'summary': 'Gym',
+        'start': {'dateTime': first.isoformat(), 'timeZone': 'UTC'},
+        'end': {'dateTime': (first + datetime.timedelta(hours=1)).isoformat(), 'timeZone': 'UTC'},
+        'recurrence': ['RRULE:FREQ=DAILY'],
+    }
+    instances = [
+        {
+            'id': f'gym_{day}',
+            'recurringEventId': 'gym',
+            'start': {'dateTime': (first + datetime.timedelta(days=day)).isoformat()},
+            'end': {'dateTime': (first + datetime.timedelta(days=day, hours=1)).isoformat()},
+        }
+        for day in range(days)
+    ]
+    return FakeService([gym], {'gym': instances}), instances
+
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch, tmp_path):
+    # Keep availability.json out of the working tree and skip the slow printing
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scheduler_logic, 'slow_print', lambda text, delay=0: None)
+
+
+def test_daily_recurring_event_is_expanded_by_the_server():
+    service, instances = daily_gym_calendar()
+
+    busy = scheduler_logic.get_unavailable_times(service, 'calendar', days=10)
+
+    assert service.instance_requests == ['gym']
+    for instance in instances[1:]:
+        start, end = parse_event_minutes(instance)
+        assert not busy.is_free(start, end)
+    # Only events the local expander supports are kept in the availability file
+    assert scheduler_logic.load_recurrence_store('calendar').resources == []
+
+
+def test_planning_avoids_daily_recurring_event():
+    service, instances = daily_gym_calendar()
+    due = datetime.datetime.now() + datetime.timedelta(days=5)
+    assignments = [{'name': 'Calculus Exam', 'due date': due.date(), 'due time': due.time().replace(microsecond=0),
+                    'time_allocated': 600, 'sessions': 10}]
+
+    scheduler_logic.dedicateAssignmentTimes(service, 'calendar', assignments)
+
+    assert len(service.inserted) == 10
+    gym = [parse_event_minutes(instance) for instance in instances]
+    for session in service.inserted:
+        start = to_minutes(datetime.datetime.fromisoformat(session['start']['dateTime']))
+        end = to_minutes(datetime.datetime.fromisoformat(session['end']['dateTime']))
+        assert all(end <= gym_start or start >= gym_end for gym_start, gym_end in gym)
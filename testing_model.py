@@ -2,21 +2,19 @@ import openai
 import os
 import json
 import re
+import argparse
 from sklearn.metrics import classification_report, confusion_matrix
 import pandas as pd
+from prompts import build_messages, check_prompt_budget
 
 # Set the OpenAI API key
 openai.api_key = os.getenv("OPENAI_API_KEY")
 openai.organization = "cs4100"
 
-# Load the validation dataset
-with open("empatheticdialogues_chat_formatted_valid.jsonl") as f:
-    validation_data = [json.loads(line) for line in f]
-
-# Counter for correct predictions
-correct_predictions = 0
-total_predictions = 0
-misclassified_samples = []
+FINETUNED_MODEL = "ft:gpt-4o-mini-2024-07-18:personal:aicollegecoach-model:ASuxr3X3"
+VALIDATION_FILE = "empatheticdialogues_chat_formatted_valid.jsonl"
+# Raw model predictions, written once so the metrics can be recomputed without querying the model again
+RESULTS_FILE = "emotion_eval_results.parquet"
 
 # Preprocess user message
 def preprocess_user_message(message):
@@ -126,84 +124,145 @@ emotion_mapping = {
 def map_emotion(emotion):
     return emotion_mapping.get(emotion.lower(), "unknown")
 
-# Collect expected and predicted emotions
-expected_emotions = []
-predicted_emotions = []
-
-# Iterate over a subset of the validation data
-for sample in validation_data[:int(0.2 * len(validation_data))]:  # 20% of the validation data
-    user_message = preprocess_user_message(sample["messages"][0]["content"])
-    expected_emotion = sample["messages"][1]["content"].replace("Emotion: ", "").strip()
-    mapped_expected_emotion = emotion_mapping.get(expected_emotion, expected_emotion)
-
-    # Query to the fine-tuned model
-    response = openai.chat.completions.create(
-        model="ft:gpt-4o-mini-2024-07-18:personal:aicollegecoach-model:ASuxr3X3",
-        messages=[
-            {"role": "system", "content": "You are an assistant trained to detect emotions. Based on the user's message, respond with a single word that represents the detected emotion."},
-            # For testing GPT-4o-mini purposes
-            # {"role": "system", "content": """
-            #     You are an assistant trained to detect emotions in user messages. 
-            #     Based on the user's message, respond with exactly one of the following emotions: 
-            #     affectionate, caring, excited, grateful, hopeful, proud, joyful, confident, impressed, 
-            #     afraid, angry, annoyed, anxious, apprehensive, ashamed, disappointed, disgusted, furious, guilty, 
-            #     jealous, sad, terrified, embarrassed, content, faithful, nostalgic, prepared, sentimental, trusting, 
-            #     surprised, anticipating, lonely, devastated.
-
-            #     Your response should be a single word from this list that best represents the emotion conveyed in the user's message.
-            #     """},
-            # {"role": "user", "content": user_message}
-        ],
-        max_tokens=10
-    )
-
-    # Extract the predicted emotion
-    predicted_emotion = response.choices[0].message.content.strip().lower()
-    mapped_predicted_emotion = emotion_mapping.get(predicted_emotion, "unknown").lower()
-
-    # Append to lists for metrics calculation
-    expected_emotions.append(mapped_expected_emotion.lower())
-    predicted_emotions.append(mapped_predicted_emotion)
-
-    # Check if prediction matches the expected emotion
-    if mapped_predicted_emotion.lower() == mapped_expected_emotion.lower():
-        correct_predictions += 1
+def query_model(validation_data, fraction=0.2):
+    """
+    Queries the fine-tuned model for a subset of the validation data and collects the raw results in columns.
+
+    Args:
+        validation_data (list): Chat formatted validation samples
+        fraction (float): Share of the validation data to evaluate
+
+    Returns:
+        DataFrame: One row per sample with the user message, expected emotion and predicted emotion
+    """
+    user_messages = []
+    expected_emotions = []
+    predicted_emotions = []
+
+    # Iterate over a subset of the validation data
+    for sample in validation_data[:int(fraction * len(validation_data))]:
+        user_message = preprocess_user_message(sample["messages"][0]["content"])
+
+        # Query to the fine-tuned model
+        messages = build_messages("emotion_classification", user_message)
+        check_prompt_budget("emotion_classification", messages)
+        response = openai.chat.completions.create(
+            model=FINETUNED_MODEL,
+            messages=messages,
+            max_tokens=10
+        )
+
+        user_messages.append(user_message)
+        expected_emotions.append(sample["messages"][1]["content"])
+        predicted_emotions.append(response.choices[0].message.content)
+
+    return pd.DataFrame({
+        "user_message": user_messages,
+        "expected_emotion": expected_emotions,
+        "predicted_emotion": predicted_emotions,
+    })
+
+
+def prepare_results(results):
+    """
+    Normalizes the raw labels and adds the mapped (broader) emotions and correctness columns, all vectorized.
+
+    Args:
+        results (DataFrame): Raw results from query_model
+
+    Returns:
+        DataFrame: The results with normalized, mapped and correctness columns
+    """
+    results = results.copy()
+    # Both the dataset and the fine-tuned model's answers have the form "Emotion: <label>"
+    for column in ("expected_emotion", "predicted_emotion"):
+        results[column] = results[column].str.replace("Emotion: ", "", regex=False).str.strip().str.lower()
+
+    # Expected emotions outside the mapping keep their own name, predicted ones become unknown
+    results["mapped_expected_emotion"] = results["expected_emotion"].map(emotion_mapping).fillna(results["expected_emotion"])
+    results["mapped_predicted_emotion"] = results["predicted_emotion"].map(emotion_mapping).fillna("unknown")
+
+    results["correct"] = results["expected_emotion"] == results["predicted_emotion"]
+    results["mapped_correct"] = results["mapped_expected_emotion"] == results["mapped_predicted_emotion"]
+    return results
+
+
+def result_labels(expected, predicted):
+    """
+    Returns every label that is expected or predicted, sorted, so predictions outside the expected labels (e.g. unknown) are counted.
+
+    Args:
+        expected (Series): Expected labels
+        predicted (Series): Predicted labels
+    """
+    return sorted(set(expected.unique()) | set(predicted.unique()))
+
+
+def confusion_matrix_frame(expected, predicted):
+    """
+    Builds a labelled confusion matrix over the sorted expected and predicted labels.
+
+    Args:
+        expected (Series): Expected labels
+        predicted (Series): Predicted labels
+
+    Returns:
+        DataFrame: Confusion matrix with expected labels as rows and predicted labels as columns
+    """
+    labels = result_labels(expected, predicted)
+    matrix = confusion_matrix(expected, predicted, labels=labels)
+    return pd.DataFrame(matrix, index=labels, columns=labels)
+
+
+def report(results, max_misclassified=10):
+    """
+    Prints accuracy, per-class metrics and confusion matrices for the fine-grained and mapped emotions.
+
+    Args:
+        results (DataFrame): Results from prepare_results
+        max_misclassified (int): Number of misclassified samples to print
+    """
+    for title, expected, predicted, correct in [
+        ("Fine-grained emotions", "expected_emotion", "predicted_emotion", "correct"),
+        ("Mapped emotions", "mapped_expected_emotion", "mapped_predicted_emotion", "mapped_correct"),
+    ]:
+        labels = result_labels(results[expected], results[predicted])
+        print(f"\n=== {title} ===")
+        print(f"Accuracy on validation subset: {results[correct].mean() * 100:.2f}%")
+
+        # Classification report
+        print("\nClassification Report:")
+        print(classification_report(results[expected], results[predicted], labels=labels, zero_division=0))
+
+        # Confusion matrix
+        print("\nConfusion Matrix:")
+        print(confusion_matrix_frame(results[expected], results[predicted]))
+
+    # Display a sample of the misclassified samples for analysis, all of them are kept in the results file
+    misclassified = results[~results["mapped_correct"]]
+    print(f"\nMisclassified Samples ({len(misclassified)} total, showing {min(max_misclassified, len(misclassified))}):")
+    for sample in misclassified.head(max_misclassified).itertuples():
+        print(f"User Message: {sample.user_message}")
+        print(f"Expected Emotion: {sample.expected_emotion} (Mapped: {sample.mapped_expected_emotion})")
+        print(f"Predicted Emotion: {sample.predicted_emotion} (Mapped: {sample.mapped_predicted_emotion})")
+        print("-" * 40)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the fine-tuned emotion detection model.")
+    parser.add_argument("--reanalyze", action="store_true", help="Recompute the metrics from the saved results without querying the model")
+    parser.add_argument("--results", default=RESULTS_FILE, help="Parquet file the raw results are written to and read from")
+    parser.add_argument("--fraction", type=float, default=0.2, help="Share of the validation data to evaluate")
+    parser.add_argument("--max-misclassified", type=int, default=10, help="Number of misclassified samples to print")
+    args = parser.parse_args()
+
+    if args.reanalyze:
+        results = pd.read_parquet(args.results)
     else:
-        # Log misclassified sample details
-        misclassified_samples.append({
-            "user_message": user_message,
-            "expected_emotion": expected_emotion,
-            "predicted_emotion": predicted_emotion,
-            "mapped_expected_emotion": mapped_expected_emotion,
-            "mapped_predicted_emotion": mapped_predicted_emotion
-        })
-    total_predictions += 1
-
-# Calculate accuracy
-accuracy = (correct_predictions / total_predictions) * 100
-print(f"Accuracy on validation subset: {accuracy:.2f}%")
-
-# Classification report
-print("\nClassification Report:")
-print(classification_report(
-    expected_emotions,  # y_true
-    predicted_emotions,  # y_pred
-    labels=list(set(expected_emotions)),  
-    zero_division=0
-))
-
-# Confusion matrix
-labels = list(set(expected_emotions))
-conf_matrix = confusion_matrix(expected_emotions, predicted_emotions, labels=list(set(expected_emotions)))
-conf_matrix_df = pd.DataFrame(conf_matrix, index=list(set(expected_emotions)), columns=list(set(expected_emotions)))
-print("\nConfusion Matrix:")
-print(conf_matrix_df)
-
-# Display misclassified samples for analysis
-print("\nMisclassified Samples:")
-for sample in misclassified_samples:
-    print(f"User Message: {sample['user_message']}")
-    print(f"Expected Emotion: {sample['expected_emotion']} (Mapped: {sample['mapped_expected_emotion']})")
-    print(f"Predicted Emotion: {sample['predicted_emotion']} (Mapped: {sample['mapped_predicted_emotion']})")
-    print("-" * 40)
+        # Load the validation dataset
+        with open(VALIDATION_FILE) as f:
+            validation_data = [json.loads(line) for line in f]
+        results = query_model(validation_data, args.fraction)
+        results.to_parquet(args.results, index=False)
 
+    report(prepare_results(results), args.max_misclassified)
@@ -0,0 +1,218 @@
+import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from zoneinfo import ZoneInfo
+
+
+# Timezone the student enters due dates and unavailable times in
+LOCAL_TIMEZONE = ZoneInfo('America/New_York')
+# Timezone the coach calendar is created in, which all day events are given in
+CALENDAR_TIMEZONE = ZoneInfo('UTC')
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def to_minutes(value):
+    """
+    Converts a datetime into whole minutes since the UTC epoch (rounded down)
+
+    Args:
+        value (datetime): aware datetime, or naive datetime in LOCAL_TIMEZONE
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=LOCAL_TIMEZONE)
+    return (value - EPOCH) // datetime.timedelta(minutes=1)
+
+
+def from_minutes(minutes):
+    """
+    Converts minutes since the UTC epoch back into an aware UTC datetime
+
+    Args:
+        minutes (int): minute offset from the UTC epoch
+    """
+    return EPOCH + datetime.timedelta(minutes=minutes)
+
+
+def to_local(minutes):
+    """
+    Converts minutes since the UTC epoch into a naive datetime in LOCAL_TIMEZONE, for display
+
+    Args:
+        minutes (int): minute offset from the UTC epoch
+    """
+    return from_minutes(minutes).astimezone(LOCAL_TIMEZONE).replace(tzinfo=None)
+
+
+def parse_event_minutes(event, calendar_timezone=CALENDAR_TIMEZONE):
+    """
+    Converts the start and end of a calendar event into minute offsets
+
+    Args:
+        event (dict): event resource returned by the Google Calendar API
+        calendar_timezone (ZoneInfo): timezone of the calendar, which all day events are given in
+    """
+    bounds = []
+    for key in ('start', 'end'):
+        if 'dateTime' in event[key]:
+            value = datetime.datetime.fromisoformat(event[key]['dateTime'].replace('Z', '+00:00'))
+        else:
+            # All day events are given as a date in the calendar's timezone
+            value = datetime.datetime.fromisoformat(event[key]['date']).replace(tzinfo=calendar_timezone)
+        bounds.append(to_minutes(value))
+    return bounds[0], bounds[1]
+
+
+class Session:
+    """
+    A single study session, stored as minute offsets from the UTC epoch
+
+    Args:
+        start (int): start of the session
+        end (int): end of the session
+        event_id (string): id of the calendar event holding the session, if it exists
+    """
+    __slots__ = ('start', 'end', 'event_id')
+
+    def __init__(self, start, end, event_id=None):
+        self.start = start
+        self.end = end
+        self.event_id = event_id
+
+    def __repr__(self):
+        return f"Session({to_local(self.start)}, {to_local(self.end)}, {self.event_id!r})"
+
+
+class BusyIntervals:
+    """
+    Sorted, non-overlapping busy intervals kept as two parallel integer arrays of minute offsets
+
+    Args:
+        intervals ([(int, int)]): initial (start, end) pairs, in any order and possibly overlapping
+    """
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, intervals=()):
+        self.starts = array('l')
+        self.ends = array('l')
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def add(self, start, end):
+        """
+        Marks [start, end) as busy, merging it with any overlapping or touching intervals
+        """
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+            del self.starts[first:last]
+            del self.ends[first:last]
+        self.starts.insert(first, start)
+        self.ends.insert(first, end)
+
+    def is_free(self, start, end):
+        """
+        Checks whether [start, end) does not overlap any busy interval
+        """
+        index = bisect_right(self.ends, start)
+        return index == len(self.starts) or self.starts[index] >= end
+
+    def blocked_until(self, start, end):
+        """
+        Returns the end of a busy interval overlapping [start, end), or None if the slot is free
+        """
+        index = bisect_right(self.ends, start)
+        if index < len(self.starts) and self.starts[index] < end:
+            return self.ends[index]
+        return None
+
+
+class WindowedBusyIntervals:
+    """
+    Busy intervals over an unbounded horizon, generated lazily one week at a time as planning reaches them.
+    Only the most recently used weeks are kept in memory; evicted weeks are generated again when needed.
+
+    Args:
+        generate (callable): generate(window_start, window_end) yields every busy (start, end) interval overlapping the window
+        fixed_intervals ([(int, int)]): busy intervals known up front, e.g. single events from the calendar
+        max_weeks (int): number of generated weeks kept in memory
+    """
+    __slots__ = ('generate', 'fixed', 'weeks', 'max_weeks')
+
+    def __init__(self, generate, fixed_intervals=(), max_weeks=8):
+        self.generate = generate
+        self.fixed = BusyIntervals(fixed_intervals)
+        self.weeks = OrderedDict()
+        self.max_weeks = max_weeks
+
+    def week(self, index):
+        """
+        Returns the busy intervals of the week starting index weeks after the UTC epoch, generating them if needed
+        """
+        if index in self.weeks:
+            self.weeks.move_to_end(index)
+            return self.weeks[index]
+        window_start = index * MINUTES_PER_WEEK
+        intervals = BusyIntervals(self.generate(window_start, window_start + MINUTES_PER_WEEK))
+        self.weeks[index] = intervals
+        if len(self.weeks) > self.max_weeks:
+            self.weeks.popitem(last=False)
+        return intervals
+
+    def add(self, start, end):
+        """
+        Marks [start, end) as busy, e.g. for a session that was just placed
+        """
+        self.fixed.add(start, end)
+
+    def blocked_until(self, start, end):
+        """
+        Returns the end of a busy interval overlapping [start, end), or None if the slot is free
+        """
+        blocked = self.fixed.blocked_until(start, end)
+        if blocked is not None:
+            return blocked
+        for index in range(start // MINUTES_PER_WEEK, (end - 1) // MINUTES_PER_WEEK + 1):
+            blocked = self.week(index).blocked_until(start, end)
+            if blocked is not None:
+                return blocked
+        return None
+
+    def is_free(self, start, end):
+        """
+        Checks whether [start, end) does not overlap any busy interval
+        """
+        return self.blocked_until(start, end) is None
+
+    def next_free(self, start, duration, step=15, limit=None):
+        """
+        Finds the first start time on the step grid from start where a slot of the given duration is free
+
+        Args:
+            start (int): earliest start of the slot
+            duration (int): length of the slot in minutes
+            step (int): spacing of the candidate start times in minutes
+            limit (int): give up once the candidate start passes this time, returning the candidate
+        """
+        candidate = start
+        while limit is None or candidate <= limit:
+            blocked = self.blocked_until(candidate, candidate + duration)
+            if blocked is None:
+                break
+            candidate += -(-(blocked - candidate) // step) * step
+        return candidate